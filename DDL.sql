@@ -1,10 +1,29 @@
 CREATE SCHEMA cinema AUTHORIZATION dbo;
+GO
 
 CREATE TABLE cinema.movies (
   movieId INT IDENTITY(1,1) PRIMARY KEY,
   title NVARCHAR(255) NOT NULL,
   genres NVARCHAR(255) NULL
 );
+GO
+
+CREATE TABLE cinema.genres (
+    genreId INT IDENTITY(1,1) PRIMARY KEY,
+    name NVARCHAR(255) NOT NULL,
+    CONSTRAINT UQ_genres_name UNIQUE (name)
+);
+GO
+
+CREATE TABLE cinema.movie_genres (
+    genreId INT NOT NULL REFERENCES cinema.genres (genreId),
+    movieId INT NOT NULL REFERENCES cinema.movies (movieId),
+    CONSTRAINT PK_movie_genres PRIMARY KEY CLUSTERED (genreId, movieId)
+);
+GO
+
+CREATE INDEX IX_movie_genres_movieId ON cinema.movie_genres (movieId) INCLUDE (genreId);
+GO
 
 CREATE TABLE cinema.users (
     uid VARCHAR(50) PRIMARY KEY,
@@ -12,6 +31,7 @@ CREATE TABLE cinema.users (
     is_admin BIT NOT NULL DEFAULT 0,
     is_active BIT NOT NULL DEFAULT 1
 );
+GO
 
 CREATE PROCEDURE cinema.users_insert
     @uid VARCHAR(50),
@@ -28,4 +48,143 @@ BEGIN
 
     INSERT INTO cinema.users (uid, email, is_admin, is_active)
     VALUES (@uid, @email, @is_admin, @is_active);
-END;
\ No newline at end of file
+END;
+GO
+
+CREATE PROCEDURE cinema.users_update_flags
+    @email VARCHAR(255),
+    @is_active BIT = NULL,
+    @is_admin BIT = NULL
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    UPDATE cinema.users
+    SET is_active = COALESCE(@is_active, is_active),
+        is_admin = COALESCE(@is_admin, is_admin)
+    OUTPUT INSERTED.uid, INSERTED.email, INSERTED.is_active, INSERTED.is_admin
+    WHERE email = @email;
+END;
+GO
+
+CREATE PROCEDURE cinema.movie_genres_sync
+    @movieId INT
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    DECLARE @names TABLE (name NVARCHAR(255) PRIMARY KEY);
+
+    INSERT INTO @names (name)
+    SELECT DISTINCT LTRIM(RTRIM(s.value))
+    FROM cinema.movies m
+    CROSS APPLY STRING_SPLIT(m.genres, '|') s
+    WHERE m.movieId = @movieId
+      AND LTRIM(RTRIM(s.value)) <> '';
+
+    INSERT INTO cinema.genres (name)
+    SELECT n.name
+    FROM @names n
+    WHERE NOT EXISTS (SELECT 1 FROM cinema.genres g WHERE g.name = n.name);
+
+    DELETE FROM cinema.movie_genres WHERE movieId = @movieId;
+
+    INSERT INTO cinema.movie_genres (genreId, movieId)
+    SELECT g.genreId, @movieId
+    FROM @names n
+    JOIN cinema.genres g ON g.name = n.name;
+END;
+GO
+
+CREATE PROCEDURE cinema.movies_insert
+    @title NVARCHAR(255),
+    @genres NVARCHAR(255)
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    DECLARE @movieId INT;
+
+    INSERT INTO cinema.movies (title, genres)
+    VALUES (@title, @genres);
+
+    SET @movieId = SCOPE_IDENTITY();
+
+    EXEC cinema.movie_genres_sync @movieId;
+
+    SELECT @movieId AS movieId;
+END;
+GO
+
+CREATE PROCEDURE cinema.movie_genres_backfill
+    @fromMovieId INT = 0
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    INSERT INTO cinema.genres (name)
+    SELECT DISTINCT LTRIM(RTRIM(s.value))
+    FROM cinema.movies m
+    CROSS APPLY STRING_SPLIT(m.genres, '|') s
+    WHERE m.movieId > @fromMovieId
+      AND LTRIM(RTRIM(s.value)) <> ''
+      AND NOT EXISTS (
+          SELECT 1 FROM cinema.genres g WHERE g.name = LTRIM(RTRIM(s.value))
+      );
+
+    INSERT INTO cinema.movie_genres (genreId, movieId)
+    SELECT DISTINCT g.genreId, m.movieId
+    FROM cinema.movies m
+    CROSS APPLY STRING_SPLIT(m.genres, '|') s
+    JOIN cinema.genres g ON g.name = LTRIM(RTRIM(s.value))
+    WHERE m.movieId > @fromMovieId
+      AND NOT EXISTS (
+          SELECT 1 FROM cinema.movie_genres mg
+          WHERE mg.genreId = g.genreId AND mg.movieId = m.movieId
+      );
+END;
+GO
+
+CREATE TYPE cinema.movie_insert_list AS TABLE (
+    ord INT NOT NULL PRIMARY KEY,
+    title NVARCHAR(255) NOT NULL,
+    genres NVARCHAR(255) NULL
+);
+GO
+
+CREATE PROCEDURE cinema.movies_insert_batch
+    @movies cinema.movie_insert_list READONLY
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    DECLARE @ids TABLE (ord INT PRIMARY KEY, movieId INT NOT NULL);
+
+    -- MERGE permite devolver el ordinal de origen junto al IDENTITY generado.
+    MERGE INTO cinema.movies AS target
+    USING @movies AS source
+    ON 1 = 0
+    WHEN NOT MATCHED THEN
+        INSERT (title, genres) VALUES (source.title, source.genres)
+    OUTPUT source.ord, INSERTED.movieId INTO @ids (ord, movieId);
+
+    INSERT INTO cinema.genres (name)
+    SELECT DISTINCT LTRIM(RTRIM(s.value))
+    FROM @movies m
+    CROSS APPLY STRING_SPLIT(m.genres, '|') s
+    WHERE LTRIM(RTRIM(s.value)) <> ''
+      AND NOT EXISTS (
+          SELECT 1 FROM cinema.genres g WHERE g.name = LTRIM(RTRIM(s.value))
+      );
+
+    INSERT INTO cinema.movie_genres (genreId, movieId)
+    SELECT DISTINCT g.genreId, i.movieId
+    FROM @ids i
+    JOIN @movies m ON m.ord = i.ord
+    CROSS APPLY STRING_SPLIT(m.genres, '|') s
+    JOIN cinema.genres g ON g.name = LTRIM(RTRIM(s.value));
+
+    SELECT movieId FROM @ids ORDER BY ord;
+END;
+GO
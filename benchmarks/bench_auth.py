@@ -0,0 +1,67 @@
+import os
+import sys
+import time
+import argparse
+
+import jwt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from starlette.requests import Request
+
+from utils import security
+from utils.security import create_jwt_token, get_request_claims
+
+
+def make_request(token: str) -> Request:
+    return Request({
+        "type": "http",
+        "method": "POST",
+        "path": "/catalog",
+        "headers": [(b"authorization", f"Bearer {token}".encode())],
+    })
+
+
+def legacy_path(token: str) -> dict:
+    # get_current_user decodificaba el token y validateadmin volvía a parsear el header y decodificarlo.
+    request = make_request(token)
+    jwt.decode(token, security.SECRET_KEY, algorithms=["HS256"])
+    scheme, header_token = request.headers["Authorization"].split()
+    return jwt.decode(header_token, security.SECRET_KEY, algorithms=["HS256"])
+
+
+def current_path(token: str) -> dict:
+    # Dependencia + decorador sobre la misma petición: el segundo acceso sale de request.state.
+    request = make_request(token)
+    get_request_claims(request, token)
+    return get_request_claims(request)
+
+
+def measure(func, token: str, iterations: int) -> float:
+    func(token)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(token)
+    return (time.perf_counter() - start) / iterations * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Costo de autenticación por petición (antes vs. después).")
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    token = create_jwt_token("bench@example.com", active=True, admin=True)
+    legacy = measure(legacy_path, token, args.iterations)
+    cached = measure(current_path, token, args.iterations)
+    security._verified_tokens.clear()
+    cold = measure(lambda t: (security._verified_tokens.clear(), current_path(t)), token, args.iterations)
+
+    print(f"{'camino':<28} {'µs/petición':>12}")
+    print(f"{'legacy (2 decodificaciones)':<28} {legacy:>12.2f}")
+    print(f"{'actual, caché fría':<28} {cold:>12.2f}")
+    print(f"{'actual, caché caliente':<28} {cached:>12.2f}")
+    print(f"speedup con caché caliente: {legacy / cached:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from models.moviescatalog import MovieCatalog
+from utils.http_cache import PreparedBody, make_etag, prepared_response
+from utils.redis_cache import _encode_raw, _decode_raw
+from utils.serialization import RawJSONResponse, rows_to_json
+from bench_catalog_rows import COLUMNS, load_rows
+
+
+def legacy_hit(cached: str) -> bytes:
+    # Antes: json.loads del string de Redis -> MovieCatalog por fila -> re-serialización de FastAPI.
+    data = json.loads(cached)["d"]
+    models = [MovieCatalog(**item) for item in data]
+    return JSONResponse(content=jsonable_encoder(models)).body
+
+
+def redis_raw_hit(cached: str) -> bytes:
+    # Ahora, hit en Redis: solo se decodifica la cabecera y el cuerpo se devuelve tal cual.
+    versions, (body, meta), soft_expiry = _decode_raw(cached)
+    return RawJSONResponse(body.encode("utf-8")).body
+
+
+def l1_hit(prepared: PreparedBody) -> bytes:
+    # Ahora, hit en L1: bytes (y variantes comprimidas) ya preparados en memoria del worker.
+    return prepared_response(prepared, accept_encoding="gzip, br").body
+
+
+def measure(func, payload, iterations: int) -> float:
+    func(payload)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(payload)
+    return (time.perf_counter() - start) / iterations * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Costo de un cache hit de /catalog (antes vs. después).")
+    parser.add_argument("--rows", type=int, nargs="+", default=[50, 500])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'filas':>6} {'legacy µs':>10} {'redis raw µs':>13} {'L1 µs':>8} {'legacy hits/s':>14} {'raw hits/s':>11} {'L1 hits/s':>10}")
+    for size in args.rows:
+        rows = load_rows(size)
+        body = rows_to_json(COLUMNS, rows)
+        legacy_cached = json.dumps({"v": [0], "d": [dict(zip(COLUMNS, row)) for row in rows]}, default=str)
+        raw_cached = _encode_raw([0], (body.decode("utf-8"), {"rows": len(rows), "last_id": rows[-1][0]}))
+        prepared = PreparedBody(body, make_etag("movies:catalog:all", [0]))
+
+        iterations = max(1, args.iterations * 50 // len(rows))
+        legacy = measure(legacy_hit, legacy_cached, iterations)
+        raw = measure(redis_raw_hit, raw_cached, iterations)
+        local = measure(l1_hit, prepared, iterations)
+        print(
+            f"{len(rows):>6} {legacy:>10.1f} {raw:>13.1f} {local:>8.1f} "
+            f"{1_000_000 / legacy:>14.0f} {1_000_000 / raw:>11.0f} {1_000_000 / local:>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from models.moviescatalog import MovieCatalog
+from utils.serialization import rows_to_json
+
+CSV_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "csv", "movies.csv")
+COLUMNS = ("movieId", "title", "genres")
+
+
+def load_rows(limit: int) -> list:
+    rows = []
+    with open(CSV_PATH, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        next(reader)
+        for record in reader:
+            rows.append((int(record[0]), record[1], record[2]))
+            if len(rows) >= limit:
+                break
+    return rows
+
+
+def legacy_path(rows: list) -> bytes:
+    # execute_query_json -> json.loads -> MovieCatalog -> serialización de FastAPI
+    results = [dict(zip(COLUMNS, row)) for row in rows]
+    payload = json.dumps(results, default=str)
+    data = json.loads(payload)
+    models = [MovieCatalog(**item) for item in data]
+    return JSONResponse(content=jsonable_encoder(models)).body
+
+
+def rows_path(rows: list) -> bytes:
+    return rows_to_json(COLUMNS, rows)
+
+
+def measure(func, rows: list, iterations: int) -> float:
+    func(rows)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(rows)
+    elapsed = time.perf_counter() - start
+    return elapsed / (iterations * len(rows)) * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Costo por fila del camino /catalog (antes vs. después).")
+    parser.add_argument("--rows", type=int, nargs="+", default=[50, 1000, 10000])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'filas':>8} {'legacy µs/fila':>16} {'rows µs/fila':>14} {'speedup':>8}")
+    for size in args.rows:
+        rows = load_rows(size)
+        iterations = max(1, args.iterations * 50 // max(len(rows), 1))
+        legacy = measure(legacy_path, rows, iterations)
+        fast = measure(rows_path, rows, iterations)
+        print(f"{len(rows):>8} {legacy:>16.3f} {fast:>14.3f} {legacy / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+import os
+import sys
+import csv
+import json
+import time
+import bisect
+import random
+import asyncio
+import argparse
+import logging
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CSV_PATH = os.path.join(ROOT, "csv", "movies.csv")
+LOGIN_PASSWORD = "Loadtest1!"
+SCENARIOS = ("catalog-cached", "catalog-uncached", "catalog-genre", "search", "stats", "login", "create")
+
+# Las credenciales reales no hacen falta: Firebase y SQL se sustituyen por dobles en proceso.
+os.environ.setdefault("FIREBASE_API_KEY", "loadtest")
+# Todas las peticiones llegan con el mismo usuario e IP: el limitador de tasa se desactiva para medir el servidor.
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+import httpx
+import firebase_admin
+
+# El lifespan inicializa el Admin SDK; con una app ya registrada no busca credenciales.
+firebase_admin._apps.setdefault("[DEFAULT]", object())
+
+from utils import firebase_client
+from utils.database import QueryResult, db_gate, db_stream_gate
+
+
+class FakeDatabase:
+    # Doble en memoria de SQL Server que entiende solo las consultas que emite la API.
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.ids = []
+        self.rows = []
+        self.genres = []
+        self.calls = 0
+
+    def seed(self, path: str, limit: int = 0) -> None:
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            next(reader)
+            for record in reader:
+                self._append(int(record[0]), record[1], record[2])
+                if limit and len(self.rows) >= limit:
+                    break
+
+    def _append(self, movie_id: int, title: str, genres: str) -> None:
+        self.ids.append(movie_id)
+        self.rows.append((movie_id, title, genres))
+        self.genres.append({name.strip().lower() for name in (genres or "").split("|") if name.strip()})
+
+    def all_genres(self) -> list:
+        return sorted(set().union(*self.genres))
+
+    def _select(self, sql: str, params: tuple, limit: int = 0) -> list:
+        params = list(params or ())
+        if "TOP (?)" in sql:
+            limit = params.pop(0)
+        after_id = params.pop(0) if params else 0
+        if "HAVING" in sql:
+            params.pop()
+        wanted = {name.lower() for name in params}
+        match_all = "HAVING" in sql
+
+        selected = []
+        for position in range(bisect.bisect_right(self.ids, after_id), len(self.rows)):
+            genres = self.genres[position]
+            if wanted and not (wanted <= genres if match_all else wanted & genres):
+                continue
+            selected.append(self.rows[position])
+            if limit and len(selected) >= limit:
+                break
+        return selected
+
+    async def execute_query(self, sql: str, params: tuple = None, needs_commit: bool = False, consistent: bool = False) -> QueryResult:
+        # Pasa por la misma compuerta de admisión que la BD real.
+        async with db_gate.slot():
+            self.calls += 1
+            await asyncio.sleep(self.latency)
+        return self._answer(sql, params)
+
+    def _answer(self, sql: str, params: tuple) -> QueryResult:
+        if "cinema.movies_insert " in sql:
+            movie_id = self.ids[-1] + 1 if self.ids else 1
+            self._append(movie_id, params[0], params[1])
+            return QueryResult(("movieId",), [(movie_id,)])
+        if "FROM cinema.users" in sql:
+            return QueryResult(("uid", "email", "is_active", "is_admin"), [(f"uid-{params[0]}", params[0], True, False)])
+        if "FROM cinema.genres" in sql:
+            return QueryResult(("name",), [(name,) for name in self.all_genres()])
+        if "MAX(movieId)" in sql:
+            return QueryResult(("movieId",), [(self.ids[-1] if self.ids else 0,)])
+        if "FROM cinema.movies" in sql:
+            return QueryResult(("movieId", "title", "genres"), self._select(sql, params))
+        return QueryResult((), [])
+
+    async def stream_query(self, sql: str, params: tuple = None, batch_size: int = 1000, consistent: bool = False):
+        async with db_stream_gate.slot():
+            self.calls += 1
+            await asyncio.sleep(self.latency)
+            rows = self._select(sql, params)
+        for start in range(0, len(rows), batch_size):
+            yield ("movieId", "title", "genres"), rows[start:start + batch_size]
+
+
+async def _identity_handler(request: httpx.Request) -> httpx.Response:
+    # Servidor de identidad local: acepta cualquier contraseña válida según el modelo.
+    return httpx.Response(200, json={"idToken": "loadtest", "refreshToken": "loadtest", "expiresIn": "3600"})
+
+
+def install_fakes(db: FakeDatabase, redis_mode: str):
+    import main
+    import controllers.moviescatalog as moviescatalog
+    import controllers.moviessearch as moviessearch
+    import controllers.catalogstats as catalogstats
+    import controllers.catalogimport as catalogimport
+    import controllers.users as users
+    import utils.redis_cache as redis_cache
+
+    moviescatalog.execute_query = db.execute_query
+    moviescatalog.stream_query = db.stream_query
+    moviessearch.stream_query = db.stream_query
+    catalogstats.stream_query = db.stream_query
+    catalogimport.execute_query = db.execute_query
+    users.execute_query = db.execute_query
+    firebase_client.set_transport(httpx.MockTransport(_identity_handler))
+
+    async def init_db_pool():
+        return None
+
+    async def close_db_pool():
+        return None
+
+    main.init_db_pool = init_db_pool
+    main.close_db_pool = close_db_pool
+
+    if redis_mode == "fake":
+        try:
+            import fakeredis.aioredis as fakeredis
+        except ImportError:
+            raise SystemExit("--redis fake requiere el paquete fakeredis (pip install fakeredis lupa)")
+
+        async def init_redis():
+            redis_cache._client = fakeredis.FakeRedis(decode_responses=True)
+            return redis_cache._client
+
+        main.init_redis = init_redis
+    elif redis_mode == "none":
+        async def init_redis():
+            return None
+
+        main.init_redis = init_redis
+    return main.app
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def make_scenario(name: str, db: FakeDatabase, token: str):
+    from controllers.moviescatalog import _encode_cursor
+
+    auth = {"Authorization": f"Bearer {token}"}
+    genres = db.all_genres()
+    max_id = db.ids[-1] if db.ids else 1
+    words = [title.split(" ")[0][:4] for _, title, _ in db.rows[:2000] if title]
+    counter = iter(range(1, 1 << 62))
+
+    def request():
+        if name == "catalog-cached":
+            return "GET", "/catalog", auth, None
+        if name == "catalog-uncached":
+            cursor = _encode_cursor(random.randint(1, max_id))
+            return "GET", f"/catalog?page_size=100&cursor={cursor}", auth, None
+        if name == "catalog-genre":
+            return "GET", "/catalog", auth, {"genre": random.choice(genres)}
+        if name == "search":
+            return "GET", "/catalog/search", auth, {"q": random.choice(words)}
+        if name == "stats":
+            return "GET", "/catalog/stats", auth, None
+        if name == "login":
+            return "POST", "/login", {}, {"email": f"user{random.randint(1, 1000)}@loadtest.dev", "password": LOGIN_PASSWORD}
+        if name == "create":
+            return "POST", "/catalog", auth, {"title": f"Load test movie {next(counter)} (2024)", "genres": "Drama"}
+        raise ValueError(name)
+
+    return request
+
+
+async def run_scenario(client: httpx.AsyncClient, name: str, request, concurrency: int, total: int, duration: float) -> dict:
+    latencies = []
+    errors = {}
+    issued = 0
+    deadline = time.perf_counter() + duration if duration else None
+
+    async def worker():
+        nonlocal issued
+        while True:
+            if deadline is not None:
+                if time.perf_counter() >= deadline:
+                    return
+            elif issued >= total:
+                return
+            issued += 1
+            method, url, headers, payload = request()
+            started = time.perf_counter()
+            try:
+                if method == "GET":
+                    response = await client.get(url, headers=headers, params=payload)
+                else:
+                    response = await client.post(url, headers=headers, json=payload)
+                status = response.status_code
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            if status != 200 and status != 304:
+                errors[status] = errors.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "scenario": name,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round((latencies[-1] if latencies else 0.0) * 1000, 3),
+    }
+
+
+async def wait_for_startup(timeout: float = 60.0) -> None:
+    import controllers.moviessearch as moviessearch
+    import controllers.moviescatalog as moviescatalog
+    import controllers.catalogstats as catalogstats
+
+    # Las mediciones empiezan con el índice de búsqueda y las estadísticas construidos y la caché precalentada.
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        warmup = moviescatalog._warmup_task
+        ready = moviessearch.title_index.ready and catalogstats.catalog_stats.ready
+        if ready and (warmup is None or warmup.done()):
+            return
+        await asyncio.sleep(0.05)
+
+
+async def main_async(args) -> list:
+    db = FakeDatabase(args.db_latency_ms / 1000)
+    db.seed(args.csv, args.seed_rows)
+    app = install_fakes(db, args.redis)
+
+    from utils.security import create_jwt_token
+
+    token = create_jwt_token("loadtest@loadtest.dev", active=True, admin=True)
+    transport = httpx.ASGITransport(app=app)
+    results = []
+    async with app.router.lifespan_context(app):
+        await wait_for_startup()
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+            for name in args.scenario:
+                request = make_scenario(name, db, token)
+                if args.warmup:
+                    await run_scenario(client, name, request, args.concurrency, args.warmup, 0)
+                calls_before = db.calls
+                result = await run_scenario(client, name, request, args.concurrency, args.requests, args.duration)
+                result["db_calls"] = db.calls - calls_before
+                results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga en proceso de la API con dobles de SQL, Redis y Firebase.")
+    parser.add_argument("--scenario", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000, help="peticiones por escenario")
+    parser.add_argument("--duration", type=float, default=0, help="segundos por escenario (sustituye a --requests)")
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--db-latency-ms", type=float, default=2.0)
+    parser.add_argument("--redis", choices=("fake", "none"), default="fake")
+    parser.add_argument("--csv", default=CSV_PATH)
+    parser.add_argument("--seed-rows", type=int, default=0, help="0 = todo el CSV")
+    parser.add_argument("--json", action="store_true", help="imprime los resultados como JSON")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    results = asyncio.run(main_async(args))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'escenario':<18} {'peticiones':>10} {'errores':>8} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'consultas BD':>12}")
+    for result in results:
+        print(
+            f"{result['scenario']:<18} {result['requests']:>10} {sum(result['errors'].values()):>8} "
+            f"{result['rps']:>9.1f} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} "
+            f"{result['p99_ms']:>8.2f} {result['max_ms']:>8.2f} {result['db_calls']:>12}"
+        )
+        if result["errors"]:
+            print(f"{'':<18} errores: {result['errors']}")
+
+
+if __name__ == "__main__":
+    main()
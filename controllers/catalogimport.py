@@ -0,0 +1,192 @@
+import os
+import csv
+import json
+import time
+import codecs
+import asyncio
+import logging
+from fastapi import HTTPException, Request
+from pydantic import ValidationError
+from typing import AsyncIterator, List, Optional
+
+from models.moviescatalog import MovieCreate
+from utils.database import execute_query, execute_many
+from utils.security import validateadmin
+from controllers.moviescatalog import invalidate_catalog_cache
+from controllers.moviessearch import catch_up_search_index
+from controllers.catalogstats import catch_up_catalog_stats
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+IMPORT_MAX_BATCH_SIZE = 10000
+IMPORT_MAX_REJECTED_SAMPLES = 100
+IMPORT_CHUNK_SIZE = 64 * 1024
+
+_INSERT_SQL = "INSERT INTO cinema.movies (title, genres) VALUES (?, ?)"
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def _iter_csv_records(lines: AsyncIterator[str]) -> AsyncIterator[str]:
+    # Un registro CSV puede ocupar varias líneas si un campo entrecomillado contiene saltos de línea.
+    buffer = None
+    async for line in lines:
+        buffer = line if buffer is None else f"{buffer}\n{line}"
+        if buffer.count('"') % 2 == 0:
+            yield buffer
+            buffer = None
+    if buffer is not None:
+        yield buffer
+
+
+async def file_chunks(path: str, chunk_size: int = IMPORT_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            chunk = await asyncio.to_thread(f.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def _validate_batch(records: list, input_format: str, header: Optional[List[str]]):
+    rows = []
+    rejected = []
+    genres = set()
+
+    if input_format == "csv":
+        numbers = [number for number, _ in records]
+        items = zip(numbers, (dict(zip(header, values)) for values in csv.reader(text for _, text in records)))
+    else:
+        items = []
+        for number, text in records:
+            try:
+                item = json.loads(text)
+                if not isinstance(item, dict):
+                    raise ValueError("se esperaba un objeto JSON")
+                items.append((number, item))
+            except ValueError as e:
+                rejected.append({"record": number, "error": f"JSON inválido: {e}"})
+
+    for number, item in items:
+        try:
+            movie = MovieCreate(title=item.get("title"), genres=item.get("genres"))
+        except ValidationError as e:
+            error = e.errors()[0]
+            field = ".".join(str(part) for part in error.get("loc", ()))
+            rejected.append({"record": number, "error": f"{field}: {error.get('msg')}"})
+            continue
+        rows.append((movie.title, movie.genres))
+        genres.add(movie.genres)
+
+    rejected.sort(key=lambda item: item["record"])
+    return rows, rejected, genres
+
+
+async def import_movies(
+    chunks: AsyncIterator[bytes],
+    input_format: str = "csv",
+    batch_size: int = IMPORT_BATCH_SIZE,
+) -> dict:
+    started = time.perf_counter()
+    report = {
+        "format": input_format,
+        "batch_size": batch_size,
+        "records_read": 0,
+        "rows_inserted": 0,
+        "rows_rejected": 0,
+        "rows_failed": 0,
+        "batches": 0,
+        "rejected": [],
+        "failed_batches": [],
+    }
+    genres_seen = set()
+
+    result = await execute_query("SELECT ISNULL(MAX(movieId), 0) AS movieId FROM cinema.movies")
+    from_movie_id = result.scalar() or 0
+
+    async def flush(batch: list) -> None:
+        rows, rejected, genres = await asyncio.to_thread(_validate_batch, batch, input_format, header)
+        report["batches"] += 1
+        report["rows_rejected"] += len(rejected)
+        free = IMPORT_MAX_REJECTED_SAMPLES - len(report["rejected"])
+        if free > 0:
+            report["rejected"].extend(rejected[:free])
+        try:
+            inserted = await execute_many(_INSERT_SQL, rows)
+        except HTTPException:
+            raise
+        except Exception as e:
+            # El lote se revierte completo; se informa su rango y la importación sigue con el siguiente.
+            logger.warning("Lote de registros %d-%d no importado: %s", batch[0][0], batch[-1][0], e)
+            report["rows_failed"] += len(rows)
+            report["failed_batches"].append(
+                {"first_record": batch[0][0], "last_record": batch[-1][0], "rows": len(rows), "error": str(e)}
+            )
+            return
+        report["rows_inserted"] += inserted
+        genres_seen.update(genres)
+        logger.info("Lote %d importado: %d filas, %d rechazadas", report["batches"], inserted, len(rejected))
+
+    lines = iter_lines(chunks)
+    records = _iter_csv_records(lines) if input_format == "csv" else lines
+    header = None
+    batch = []
+    number = 0
+    try:
+        async for record in records:
+            if not record.strip():
+                continue
+            if input_format == "csv" and header is None:
+                header = [column.strip().lower() for column in next(csv.reader([record]))]
+                if "title" not in header:
+                    raise HTTPException(status_code=400, detail="El CSV debe incluir una columna 'title'.")
+                continue
+            number += 1
+            batch.append((number, record))
+            if len(batch) >= batch_size:
+                await flush(batch)
+                batch = []
+        if batch:
+            await flush(batch)
+    finally:
+        report["records_read"] = number
+        if report["rows_inserted"]:
+            # Una única sincronización del índice de géneros y una única invalidación de caché al final.
+            await execute_query("EXEC cinema.movie_genres_backfill ?", (from_movie_id,), needs_commit=True)
+            await invalidate_catalog_cache(*genres_seen)
+            await catch_up_search_index()
+            await catch_up_catalog_stats()
+
+    elapsed = time.perf_counter() - started
+    report["elapsed_seconds"] = round(elapsed, 3)
+    report["rows_per_second"] = round(report["rows_inserted"] / elapsed, 1) if elapsed else 0.0
+    report["rejected_truncated"] = report["rows_rejected"] > len(report["rejected"])
+    logger.info(
+        "Importación finalizada: %d filas en %ss (%s filas/s), %d rechazadas, %d en lotes fallidos",
+        report["rows_inserted"], report["elapsed_seconds"], report["rows_per_second"],
+        report["rows_rejected"], report["rows_failed"],
+    )
+    return report
+
+
+@validateadmin
+async def import_movies_upload(request: Request, input_format: str = "csv", batch_size: int = IMPORT_BATCH_SIZE) -> dict:
+    try:
+        return await import_movies(request.stream(), input_format, batch_size)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error en la importación masiva: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error en la importación masiva: {str(e)}")
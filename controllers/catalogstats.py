@@ -0,0 +1,199 @@
+import os
+import csv
+import asyncio
+import logging
+from fastapi import HTTPException
+from fastapi.responses import Response
+from typing import Optional
+
+from utils.database import stream_query
+from utils.catalog_stats import CatalogStats
+from utils.http_cache import PreparedBody, content_etag, prepared_response
+from utils.serialization import dumps_bytes
+from utils.singleflight import single_flight
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CATALOG_STATS_SOURCE = os.getenv("CATALOG_STATS_SOURCE", "db").lower()
+CATALOG_STATS_CSV = os.getenv("CATALOG_STATS_CSV", os.path.join(BASE_DIR, "csv", "movies.csv"))
+CATALOG_STATS_CSV_BATCH = 5000
+# Ids por debajo del último cargado que se releen en cada puesta al día (altas confirmadas tarde).
+CATALOG_STATS_RESCAN_WINDOW = int(os.getenv("CATALOG_STATS_RESCAN_WINDOW", "1000"))
+STATS_RETRY_AFTER = 5
+# Si el cálculo inicial falla (p. ej. BD inaccesible al arrancar) se reintenta con espera exponencial.
+STATS_BUILD_RETRY_SECONDS = 2
+STATS_BUILD_RETRY_MAX_SECONDS = 60
+
+_SELECT_MOVIES = "SELECT movieId, title, genres FROM cinema.movies WHERE movieId > ? ORDER BY movieId"
+
+catalog_stats = CatalogStats(CATALOG_STATS_RESCAN_WINDOW)
+_prepared: Optional[tuple] = None
+_build_task: Optional[asyncio.Task] = None
+_pending_catch_up: set = set()
+
+
+async def _load_from_db(stats: CatalogStats, after_id: int, consistent: bool = False) -> int:
+    loaded = 0
+    async for _, rows in stream_query(_SELECT_MOVIES, (after_id,), consistent=consistent):
+        loaded += stats.add_many(rows)
+        await asyncio.sleep(0)
+    return loaded
+
+
+def _read_csv_batches(path: str, after_id: int):
+    batches = []
+    with open(path, newline="", encoding="utf-8") as handle:
+        batch = []
+        for record in csv.DictReader(handle):
+            movie_id = int(record["movieId"])
+            if movie_id <= after_id:
+                continue
+            batch.append((movie_id, record["title"], record["genres"]))
+            if len(batch) >= CATALOG_STATS_CSV_BATCH:
+                batches.append(batch)
+                batch = []
+        if batch:
+            batches.append(batch)
+    return batches
+
+
+async def _load_from_csv(stats: CatalogStats, after_id: int) -> int:
+    loaded = 0
+    batches = await asyncio.to_thread(_read_csv_batches, CATALOG_STATS_CSV, after_id)
+    for rows in batches:
+        loaded += stats.add_many(rows)
+        await asyncio.sleep(0)
+    return loaded
+
+
+async def _load_into(stats: CatalogStats, after_id: int, consistent: bool = False) -> int:
+    if CATALOG_STATS_SOURCE == "csv":
+        return await _load_from_csv(stats, after_id)
+    return await _load_from_db(stats, after_id, consistent)
+
+
+async def build_catalog_stats() -> None:
+    global catalog_stats
+    stats = CatalogStats(CATALOG_STATS_RESCAN_WINDOW)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await _load_into(stats, 0)
+    stats.ready = True
+    if CATALOG_STATS_SOURCE != "csv":
+        # Las altas ocurridas durante la carga se recuperan antes del cambio.
+        await _load_into(stats, stats.rescan_from())
+    catalog_stats = stats
+    logger.info(
+        f"Estadísticas del catálogo calculadas: {len(stats)} películas, "
+        f"{len(stats.genres)} géneros en {loop.time() - started:.2f}s"
+    )
+
+
+async def catch_up_catalog_stats() -> int:
+    # Con CSV como fuente solo se suman las altas de este worker (record_movie).
+    if not catalog_stats.ready or CATALOG_STATS_SOURCE == "csv":
+        return 0
+
+    async def load() -> int:
+        stats = catalog_stats
+        # Responde a una escritura recién avisada: una réplica atrasada aún no tendría las filas nuevas.
+        loaded = await _load_into(stats, stats.rescan_from(), consistent=True)
+        if loaded:
+            logger.info(f"Estadísticas del catálogo actualizadas con {loaded} película(s) nuevas")
+        return loaded
+
+    return await single_flight("stats:catch_up", load)
+
+
+def schedule_stats_catch_up() -> None:
+    task = asyncio.get_running_loop().create_task(catch_up_catalog_stats())
+    _pending_catch_up.add(task)
+    task.add_done_callback(_catch_up_done)
+
+
+def _catch_up_done(task: asyncio.Task) -> None:
+    _pending_catch_up.discard(task)
+    if not task.cancelled() and task.exception():
+        logger.warning(f"⚠️ Fallo al actualizar las estadísticas del catálogo: {task.exception()}")
+
+
+def record_movie(movie_id: int, title: str, genres: Optional[str]) -> None:
+    if catalog_stats.ready:
+        catalog_stats.record(movie_id, title, genres)
+
+
+def preload_catalog_stats() -> bool:
+    # Con CSV como fuente se calcula en el proceso maestro antes del fork: los workers heredan los
+    # agregados ya hechos en lugar de repetir la carga cada uno.
+    global catalog_stats
+    if CATALOG_STATS_SOURCE != "csv" or catalog_stats.ready:
+        return False
+    stats = CatalogStats(CATALOG_STATS_RESCAN_WINDOW)
+    for rows in _read_csv_batches(CATALOG_STATS_CSV, 0):
+        stats.add_many(rows)
+    stats.ready = True
+    catalog_stats = stats
+    logger.info(f"Estadísticas del catálogo precargadas desde CSV: {len(stats)} películas")
+    return True
+
+
+async def _build_until_ready() -> None:
+    delay = STATS_BUILD_RETRY_SECONDS
+    while True:
+        try:
+            await build_catalog_stats()
+            return
+        except Exception as e:
+            logger.error("❌ Error al calcular las estadísticas del catálogo, reintento en %ds: %s", delay, e)
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, STATS_BUILD_RETRY_MAX_SECONDS)
+
+
+def _build_done(task: asyncio.Task) -> None:
+    global _build_task
+    if _build_task is task:
+        _build_task = None
+    if not task.cancelled() and task.exception():
+        logger.error(f"❌ Error al calcular las estadísticas del catálogo: {task.exception()}")
+
+
+def start_catalog_stats() -> None:
+    global _build_task
+    if _build_task is None and not catalog_stats.ready:
+        _build_task = asyncio.get_running_loop().create_task(_build_until_ready())
+        _build_task.add_done_callback(_build_done)
+
+
+async def stop_catalog_stats() -> None:
+    global _build_task
+    tasks = list(_pending_catch_up)
+    if _build_task is not None:
+        tasks.append(_build_task)
+        _build_task = None
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _prepared_stats(stats: CatalogStats) -> PreparedBody:
+    # Se serializa y comprime una vez por versión de los agregados, no en cada petición.
+    global _prepared
+    if _prepared is None or _prepared[0] is not stats or _prepared[1] != stats.version:
+        body = dumps_bytes(stats.to_dict())
+        _prepared = (stats, stats.version, PreparedBody(body, content_etag(body)))
+    return _prepared[2]
+
+
+async def get_catalog_stats(
+    if_none_match: Optional[str] = None,
+    accept_encoding: Optional[str] = None,
+) -> Response:
+    stats = catalog_stats
+    if not stats.ready:
+        raise HTTPException(
+            status_code=503,
+            detail="Las estadísticas del catálogo se están calculando, intente de nuevo en unos segundos.",
+            headers={"Retry-After": str(STATS_RETRY_AFTER)},
+        )
+    return prepared_response(_prepared_stats(stats), if_none_match, accept_encoding)
@@ -1,51 +1,44 @@
-import os
-import json
 import logging
-import firebase_admin
-import requests
+import httpx
 import traceback
 
 from fastapi import HTTPException
-from firebase_admin import credentials, auth as firebase_auth, _auth_utils
-from dotenv import load_dotenv
 
-from utils.database import execute_query_json
+from utils.database import execute_query
 from utils.security import create_jwt_token
+from utils.firebase_client import (
+    FIREBASE_API_KEY,
+    FirebaseAdminUnavailable,
+    run_admin,
+    run_admin_unthrottled,
+    sign_in_with_password,
+)
+from controllers.users import get_user_profile, prime_user_profile
+from controllers.tokens import issue_refresh_token
 from models.userregister import UserRegister
 from models.userlogin import UserLogin
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-load_dotenv()
-
-if not firebase_admin._apps:
-    try:
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        cred_path = os.getenv("FIREBASE_CRED_PATH")
-        full_cred_path = os.path.normpath(os.path.join(base_dir, cred_path))
-
-        if not os.path.isfile(full_cred_path):
-            raise FileNotFoundError(f"No se encontró archivo de credenciales Firebase: {full_cred_path}")
-
-        cred = credentials.Certificate(full_cred_path)
-        firebase_admin.initialize_app(cred)
-        logger.info("Firebase inicializado correctamente.")
-    except Exception as e:
-        logger.error(f"Error al inicializar Firebase: {e}")
-        raise HTTPException(status_code=500, detail="No se pudo inicializar Firebase")
-
 async def register_user_firebase(user: UserRegister) -> dict:
     user_record = None
     try:
-        user_record = firebase_auth.create_user(
+        user_record = await run_admin(
+            "create_user",
             email=user.email,
             password=user.password
         )
         logger.info(f"Usuario creado en Firebase: {user.email}")
-    except _auth_utils.EmailAlreadyExistsError:
-        raise HTTPException(status_code=400, detail="El correo ya existe en Firebase.")
+    except HTTPException:
+        raise
+    except FirebaseAdminUnavailable:
+        raise HTTPException(status_code=500, detail="No se pudo inicializar Firebase")
     except Exception as e:
+        # firebase_admin ya está cargado: run_admin lo importó antes de llamar al SDK.
+        from firebase_admin import auth as firebase_auth
+
+        if isinstance(e, firebase_auth.EmailAlreadyExistsError):
+            raise HTTPException(status_code=400, detail="El correo ya existe en Firebase.")
         logger.exception("Error al crear usuario en Firebase")
         raise HTTPException(status_code=400, detail=f"Error al registrar usuario: {e}")
     query = """
@@ -58,53 +51,67 @@ async def register_user_firebase(user: UserRegister) -> dict:
         user.is_active
     )
     try:
-        result_json = await execute_query_json(query, params, needs_commit=True)
+        # El token se emite antes del INSERT: si se rechaza por saturación solo queda por deshacer el alta
+        # en Firebase, no una fila en SQL ni un perfil en caché.
+        custom_token = (await run_admin("create_custom_token", user_record.uid)).decode('utf-8')
+        await execute_query(query, params, needs_commit=True)
         logger.info(f"Usuario insertado en SQL Server: {user.email}")
-        custom_token = firebase_auth.create_custom_token(user_record.uid).decode('utf-8')
-        return {
-            "message": "Usuario creado e insertado correctamente.",
-            "firebase_custom_token": custom_token
-        }
     except Exception as e:
-        logger.error(f"Error en base de datos al insertar usuario {user.email}: {e}", exc_info=True)
-        firebase_auth.delete_user(user_record.uid)
+        logger.error(f"Error al completar el registro del usuario {user.email}: {e}", exc_info=True)
+        try:
+            await run_admin_unthrottled("delete_user", user_record.uid)
+        except Exception as delete_error:
+            logger.error(
+                "No se pudo eliminar de Firebase el usuario %s (uid %s) tras el fallo: %s",
+                user.email,
+                user_record.uid,
+                delete_error,
+            )
+        if isinstance(e, HTTPException):
+            raise
         raise HTTPException(status_code=500, detail=f"Error al insertar en base de datos: {str(e)}")
 
+    # El primer login tras el registro ya no necesita ir a la BD.
+    await prime_user_profile({
+        "uid": user_record.uid,
+        "email": user.email,
+        "is_active": user.is_active,
+        "is_admin": user.is_admin,
+    })
+    return {
+        "message": "Usuario creado e insertado correctamente.",
+        "firebase_custom_token": custom_token
+    }
+
 async def login_user_firebase(user: UserLogin):
-    api_key = os.getenv("FIREBASE_API_KEY")
-    if not api_key:
+    if not FIREBASE_API_KEY:
         logger.error("API Key de Firebase no configurada")
         raise HTTPException(status_code=500, detail="API Key de Firebase no configurada")
 
-    url = f"https://identitytoolkit.googleapis.com/v1/accounts:signInWithPassword?key={api_key}"
-    payload = {
-        "email": user.email,
-        "password": user.password,
-        "returnSecureToken": True
-    }
-
     try:
-        response = requests.post(url, json=payload)
-        response.raise_for_status()
-    except requests.HTTPError as e:
-        logger.warning(f"Error de autenticación para {user.email}: {e}")
+        await sign_in_with_password(user.email, user.password)
+    except httpx.HTTPStatusError as e:
+        # No se registra la URL: incluye la API key en el query string.
+        status = e.response.status_code
+        if status >= 500:
+            logger.error(f"Firebase respondió {status} al autenticar a {user.email}")
+            raise HTTPException(status_code=502, detail="Error al autenticar con Firebase.")
+        logger.warning(f"Error de autenticación para {user.email}: HTTP {status}")
         raise HTTPException(status_code=400, detail="Credenciales inválidas.")
+    except httpx.TimeoutException:
+        logger.error(f"Tiempo de espera agotado autenticando a {user.email} con Firebase")
+        raise HTTPException(status_code=504, detail="Firebase no respondió a tiempo.")
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception("Error al autenticar con Firebase")
         raise HTTPException(status_code=500, detail="Error al autenticar con Firebase.")
 
-    query = """
-        SELECT uid, email, is_active, is_admin
-        FROM cinema.users
-        WHERE email = ?
-    """
-
     try:
-        result_json = await execute_query_json(query, (user.email,))
-        logger.debug(f"Resultado JSON de la consulta: {result_json} (tipo: {type(result_json)})")
-
-        result = json.loads(result_json)
-        user_data = result[0]
+        user_data = await get_user_profile(user.email)
+        if user_data is None:
+            logger.warning(f"Usuario no encontrado en base de datos para email: {user.email}")
+            raise HTTPException(status_code=404, detail="Usuario no encontrado en base de datos.")
 
         if not user_data["is_active"]:
             raise HTTPException(status_code=403, detail="Usuario inactivo")
@@ -115,16 +122,16 @@ async def login_user_firebase(user: UserLogin):
             admin=user_data["is_admin"]
         )
 
-        return {
+        response = {
             "message": "Usuario autenticado exitosamente",
             "token": token
         }
-    except IndexError:
-        logger.warning(f"Usuario no encontrado en base de datos para email: {user.email}")
-        raise HTTPException(status_code=404, detail="Usuario no encontrado en base de datos.")
-    except json.JSONDecodeError as e:
-        logger.error(f"Error al parsear JSON: {e}, contenido recibido: {result_json}", exc_info=True)
-        raise HTTPException(status_code=500, detail="Error interno: JSON inválido.")
+        refresh_token = await issue_refresh_token(user_data["email"])
+        if refresh_token:
+            response["refresh_token"] = refresh_token
+        return response
+    except HTTPException:
+        raise
     except Exception as e:
         tb_str = traceback.format_exc()
         logger.error(f"Error inesperado: {str(e)}\nTraceback:\n{tb_str}")
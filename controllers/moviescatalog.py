@@ -1,88 +1,405 @@
-import json
+import os
+import asyncio
+import base64
 import logging
+import binascii
+from urllib.parse import urlencode
 from fastapi import HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
 from typing import Optional, List
 
-from utils.database import execute_query_json
-from utils.redis_cache import get_redis_client, get_from_cache, store_in_cache
-from models.moviescatalog import MovieCatalog
+from utils.database import execute_query, stream_query, pin_reads_to_primary, reads_pinned
+from utils.redis_cache import (
+    get_redis_client,
+    get_or_fill,
+    invalidate_tags,
+    add_invalidation_handler,
+)
+from utils.local_cache import LocalCache
+from utils.metrics import register_cache_stats
+from utils.serialization import RawJSONResponse, dumps_bytes, rows_to_json
+from utils.http_cache import PreparedBody, make_etag, content_etag, prepared_response
+from models.moviescatalog import MovieCatalog, MovieCreate
 from utils.security import validateadmin
+from controllers.moviessearch import index_movie, schedule_search_catch_up
+from controllers.catalogstats import record_movie, schedule_stats_catch_up
 
 logger = logging.getLogger(__name__)
 
 MOVIES_CACHE_KEY = "movies:catalog:all"
+CATALOG_ALL_TAG = "catalog:all"
 CACHE_TTL = 1800
+CATALOG_PAGE_SIZE = 50
+CATALOG_MAX_PAGE_SIZE = 500
+CATALOG_MAX_GENRES = 10
+CATALOG_MAX_BATCH_ITEMS = 1000
+MOVIE_INSERT_LIST_TYPE = "movie_insert_list"
+MOVIE_INSERT_LIST_SCHEMA = "cinema"
+CATALOG_L1_MAX_ENTRIES = int(os.getenv("CATALOG_L1_MAX_ENTRIES", "256"))
+CATALOG_L1_TTL = float(os.getenv("CATALOG_L1_TTL", "60"))
+# Pasado CACHE_TTL la página se sigue sirviendo hasta CATALOG_STALE_TTL segundos más mientras se refresca.
+CATALOG_STALE_TTL = int(os.getenv("CATALOG_STALE_TTL", "300"))
+CATALOG_WARMUP = os.getenv("CATALOG_WARMUP", "true").lower() in ("1", "true", "yes")
+CATALOG_WARMUP_CONCURRENCY = int(os.getenv("CATALOG_WARMUP_CONCURRENCY", "4"))
 
-redis_client = get_redis_client()
+catalog_l1 = LocalCache("catalog_l1", max_entries=CATALOG_L1_MAX_ENTRIES, ttl=CATALOG_L1_TTL)
+register_cache_stats(catalog_l1.stats)
+_warmup_task: Optional[asyncio.Task] = None
 
-async def get_movies_catalog(category: Optional[str] = None) -> List[MovieCatalog]:
-    if not redis_client:
-        logger.warning("Redis no disponible, consulta directa a BD.")
 
-    cache_key = MOVIES_CACHE_KEY
-    query = "SELECT TOP 50 movieId, title, genres FROM cinema.movies"
-    params = ()
+def _on_invalidation(tags: List[str]) -> None:
+    catalog_l1.invalidate_tags(tags)
+    # Escritura en otro worker: las páginas de estos tags no deben recargarse de una réplica que aún no la tenga.
+    pin_reads_to_primary(tags)
+    if CATALOG_ALL_TAG in tags:
+        # Hubo altas en otro worker: el índice de búsqueda y las estadísticas locales recogen las filas nuevas.
+        schedule_search_catch_up()
+        schedule_stats_catch_up()
+
+
+add_invalidation_handler(_on_invalidation)
+
+
+def _encode_cursor(movie_id: int) -> str:
+    return base64.urlsafe_b64encode(f"v1:{movie_id}".encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        version, movie_id = base64.urlsafe_b64decode(padded).decode().split(":", 1)
+        if version != "v1":
+            raise ValueError(version)
+        return int(movie_id)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Cursor de paginación inválido.")
 
+
+def _page_headers(row_count: int, page_size: int, last_id: Optional[int], genres: List[str], match: str) -> dict:
+    headers = {}
+    if last_id is not None and row_count >= page_size:
+        next_cursor = _encode_cursor(last_id)
+        query = [("page_size", page_size), ("cursor", next_cursor)]
+        query.extend(("genre", genre) for genre in genres)
+        if len(genres) > 1:
+            query.append(("match", match))
+        headers["X-Next-Cursor"] = next_cursor
+        headers["Link"] = f'</catalog?{urlencode(query)}>; rel="next"'
+    return headers
+
+
+def _normalize_genres(category: Optional[str], genres: Optional[List[str]]) -> List[str]:
+    names = list(genres or [])
     if category:
-        category_lower = category.lower()
-        cache_key = f"movies:catalog:{category_lower}"
-        query = "SELECT TOP 50 movieId, title, genres FROM cinema.movies WHERE LOWER(genres) LIKE ?"
-        params = (f"%{category_lower}%",)
+        names.append(category)
+    normalized = sorted({name.strip().lower() for name in names if name and name.strip()})
+    if len(normalized) > CATALOG_MAX_GENRES:
+        raise HTTPException(status_code=400, detail=f"Máximo {CATALOG_MAX_GENRES} géneros por consulta.")
+    return normalized
+
+
+def _catalog_cache_key(genres: List[str], match: str) -> str:
+    if not genres:
+        return MOVIES_CACHE_KEY
+    if len(genres) == 1:
+        return f"movies:catalog:{genres[0]}"
+    return f"movies:catalog:{match}:{'|'.join(genres)}"
+
+
+def _catalog_tags(genres: List[str]) -> List[str]:
+    if not genres:
+        return [CATALOG_ALL_TAG]
+    return [f"genre:{genre}" for genre in genres]
+
 
-    cached_data = get_from_cache(redis_client, cache_key) if redis_client else None
-    if cached_data is not None:
-        logger.info(f"Cache hit para key: {cache_key}")
-        return [MovieCatalog(**item) for item in cached_data]
+def _movie_tags(*genres_values: Optional[str]) -> List[str]:
+    names = {
+        name.strip().lower()
+        for genres in genres_values
+        for name in (genres or "").split("|")
+        if name.strip()
+    }
+    return [CATALOG_ALL_TAG] + [f"genre:{name}" for name in sorted(names)]
 
+
+async def invalidate_catalog_cache(*genres_values: Optional[str]) -> List[str]:
+    tags = _movie_tags(*genres_values)
+    pin_reads_to_primary(tags)
+    catalog_l1.invalidate_tags(tags)
+    await invalidate_tags(get_redis_client(), tags)
+    logger.info("Cache invalidado para tags: %s", tags)
+    return tags
+
+
+def _catalog_query(genres: List[str], match: str, after_id: int, page_size: Optional[int]):
+    top = "TOP (?) " if page_size else ""
+    query = f"SELECT {top}m.movieId, m.title, m.genres FROM cinema.movies m WHERE m.movieId > ?"
+    params = [page_size] if page_size else []
+    params.append(after_id)
+    if genres:
+        # Filtra por el índice cinema.movie_genres en lugar de LIKE sobre la columna genres.
+        placeholders = ", ".join("?" for _ in genres)
+        if match == "all" and len(genres) > 1:
+            query += (
+                " AND m.movieId IN ("
+                "SELECT mg.movieId FROM cinema.movie_genres mg "
+                "JOIN cinema.genres g ON g.genreId = mg.genreId "
+                f"WHERE g.name IN ({placeholders}) "
+                "GROUP BY mg.movieId HAVING COUNT(DISTINCT mg.genreId) = ?)"
+            )
+            params.extend(genres)
+            params.append(len(genres))
+        else:
+            query += (
+                " AND EXISTS ("
+                "SELECT 1 FROM cinema.movie_genres mg "
+                "JOIN cinema.genres g ON g.genreId = mg.genreId "
+                f"WHERE mg.movieId = m.movieId AND g.name IN ({placeholders}))"
+            )
+            params.extend(genres)
+    query += " ORDER BY m.movieId"
+    return query, tuple(params)
+
+
+async def _load_cached_page(
+    redis_client,
+    cache_key: str,
+    tags: List[str],
+    query: str,
+    params: tuple,
+) -> PreparedBody:
+    async def load():
+        # Se evalúa al cargar: también cubre el refresco en segundo plano de una entrada vencida.
+        result = await execute_query(query, params, consistent=reads_pinned(tags))
+        meta = {"rows": len(result), "last_id": result.rows[-1][0] if result.rows else None}
+        return result.to_json().decode("utf-8"), meta
+
+    # Redis guarda los bytes finales de la respuesta: en un hit no se decodifica
+    # el JSON ni se construyen modelos. Un único llenado por clave.
+    (text, meta), versions = await get_or_fill(
+        redis_client,
+        cache_key,
+        load,
+        CACHE_TTL,
+        tags=tags,
+        raw=True,
+        stale_ttl=CATALOG_STALE_TTL,
+        with_versions=True,
+    )
+    body = text.encode("utf-8")
+    # El ETag sale de las versiones con que se guardó o validó este cuerpo, no de una lectura previa:
+    # una invalidación concurrente no puede dejar un cuerpo viejo con el ETag nuevo.
+    etag = make_etag(cache_key, versions) if versions is not None else content_etag(body)
+    prepared = PreparedBody(body, etag, meta=meta)
+    catalog_l1.set(cache_key, prepared, tags=tags)
+    return prepared
+
+
+async def _warm_page(redis_client, genre_names: List[str]) -> None:
+    cache_key = _catalog_cache_key(genre_names, "any")
+    tags = _catalog_tags(genre_names)
+    query, params = _catalog_query(genre_names, "any", 0, CATALOG_PAGE_SIZE)
+    await _load_cached_page(redis_client, cache_key, tags, query, params)
+
+
+async def warm_catalog_cache() -> int:
+    redis_client = get_redis_client()
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    pages = [[]]
     try:
-        result_json = await execute_query_json(query, params)
-        data = json.loads(result_json)
+        result = await execute_query("SELECT name FROM cinema.genres ORDER BY name")
+        names = sorted({str(row[0]).strip().lower() for row in result.rows if row[0] and str(row[0]).strip()})
+        pages.extend([name] for name in names)
+    except Exception as e:
+        logger.warning("⚠️ No se pudieron leer los géneros para precalentar la caché: %s", e)
+
+    # Pocas consultas a la vez: el precalentamiento no debe acaparar el pool mientras llegan peticiones.
+    semaphore = asyncio.Semaphore(CATALOG_WARMUP_CONCURRENCY)
+
+    async def warm(genre_names: List[str]) -> bool:
+        async with semaphore:
+            try:
+                await _warm_page(redis_client, genre_names)
+                return True
+            except Exception as e:
+                logger.warning("⚠️ Fallo al precalentar la página %s: %s", _catalog_cache_key(genre_names, "any"), e)
+                return False
+
+    warmed = sum(await asyncio.gather(*(warm(genre_names) for genre_names in pages)))
+    logger.info("Caché del catálogo precalentada: %d/%d páginas en %.2fs", warmed, len(pages), loop.time() - started)
+    return warmed
+
 
-        if redis_client:
-            store_in_cache(redis_client, cache_key, data, CACHE_TTL)
+def _warmup_done(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception():
+        logger.error("❌ Error al precalentar la caché del catálogo: %s", task.exception())
 
-        return [MovieCatalog(**item) for item in data]
 
+def start_catalog_warmup() -> None:
+    global _warmup_task
+    if CATALOG_WARMUP and _warmup_task is None:
+        _warmup_task = asyncio.get_running_loop().create_task(warm_catalog_cache())
+        _warmup_task.add_done_callback(_warmup_done)
+
+
+async def stop_catalog_warmup() -> None:
+    global _warmup_task
+    if _warmup_task is not None:
+        _warmup_task.cancel()
+        await asyncio.gather(_warmup_task, return_exceptions=True)
+        _warmup_task = None
+
+
+async def get_movies_catalog(
+    category: Optional[str] = None,
+    page_size: int = CATALOG_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    genres: Optional[List[str]] = None,
+    match: str = "any",
+    if_none_match: Optional[str] = None,
+    accept_encoding: Optional[str] = None,
+) -> Response:
+    redis_client = get_redis_client()
+    if not redis_client:
+        logger.warning("Redis no disponible, consulta directa a BD.")
+
+    after_id = _decode_cursor(cursor) if cursor else 0
+    genre_names = _normalize_genres(category, genres)
+    query, params = _catalog_query(genre_names, match, after_id, page_size)
+
+    # Solo la primera página con el tamaño por defecto se guarda en caché; el resto es un seek por PK.
+    cache_key = None
+    if after_id == 0 and page_size == CATALOG_PAGE_SIZE:
+        cache_key = _catalog_cache_key(genre_names, match)
+
+    try:
+        if cache_key:
+            prepared = catalog_l1.get(cache_key)
+            if prepared is None:
+                # La entrada y las versiones de sus tags llegan en el mismo MGET; el 304 lo resuelve
+                # prepared_response con las cabeceras de paginación de la entrada.
+                prepared = await _load_cached_page(
+                    redis_client, cache_key, _catalog_tags(genre_names), query, params
+                )
+            else:
+                logger.debug("Cache hit para key: %s", cache_key)
+            headers = _page_headers(prepared.meta["rows"], page_size, prepared.meta["last_id"], genre_names, match)
+            return prepared_response(prepared, if_none_match, accept_encoding, headers=headers)
+
+        result = await execute_query(query, params)
+
+        # Las filas ya vienen validadas por el esquema de la tabla; se serializan sin pasar por MovieCatalog.
+        last_id = result.rows[-1][0] if result.rows else None
+        headers = _page_headers(len(result), page_size, last_id, genre_names, match)
+        return RawJSONResponse(result.to_json(), headers=headers)
+
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error al obtener catálogo: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error al obtener catálogo: {str(e)}")
 
 
+async def export_movies_catalog(
+    category: Optional[str] = None,
+    output_format: str = "ndjson",
+    genres: Optional[List[str]] = None,
+    match: str = "any",
+) -> StreamingResponse:
+    query, params = _catalog_query(_normalize_genres(category, genres), match, 0, None)
+
+    async def ndjson_body():
+        async for columns, rows in stream_query(query, params):
+            yield b"".join(dumps_bytes(dict(zip(columns, row))) + b"\n" for row in rows)
+
+    async def json_array_body():
+        yield b"["
+        separator = b""
+        async for columns, rows in stream_query(query, params):
+            # rows_to_json serializa el lote completo; se quitan los corchetes para encadenarlo.
+            yield separator + rows_to_json(columns, rows)[1:-1]
+            separator = b","
+        yield b"]"
+
+    if output_format == "json":
+        return StreamingResponse(json_array_body(), media_type="application/json")
+    return StreamingResponse(ndjson_body(), media_type="application/x-ndjson")
+
+
 @validateadmin
 async def add_movie(request: Request, movie: MovieCatalog):
     redis_client = get_redis_client()
     if redis_client is None:
         logger.warning("Redis no disponible, continuará sin caché.")
     query_insert = """
-        INSERT INTO cinema.movies (title, genres)
-        OUTPUT INSERTED.movieId
-        VALUES (?, ?)
+        EXEC cinema.movies_insert ?, ?
     """
     params = (movie.title, movie.genres)
 
     try:
-        result_json = await execute_query_json(query_insert, params, needs_commit=True)
-        inserted_result = json.loads(result_json)
+        result = await execute_query(query_insert, params, needs_commit=True)
 
-        if not inserted_result or "movieId" not in inserted_result[0]:
+        if not result.rows or "movieId" not in result.columns:
             raise HTTPException(status_code=500, detail="No se pudo obtener el ID insertado.")
-        inserted_id = inserted_result[0]["movieId"]
-        logger.info(f"Película insertada con ID {inserted_id}")
-
-        if redis_client:
-            redis_client.delete(MOVIES_CACHE_KEY)
-            logger.info(f"Cache invalidado: {MOVIES_CACHE_KEY}")
+        inserted_id = result.scalar()
+        logger.info("Película insertada con ID %s", inserted_id)
+        index_movie(inserted_id, movie.title, movie.genres)
+        record_movie(inserted_id, movie.title, movie.genres)
 
-            if movie.genres:
-                genres = [g.strip().lower() for g in movie.genres.split(",")]
-                for genre in genres:
-                    key = f"movies:catalog:{genre}"
-                    redis_client.delete(key)
-                    logger.info(f"Cache invalidado: {key}")
+        await invalidate_catalog_cache(movie.genres)
 
         movie.movieId = inserted_id
         return {"message": "Película agregada correctamente.", "movie": movie.dict()}
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error al agregar película: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Error al agregar película: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error al agregar película: {str(e)}")
+
+@validateadmin
+async def add_movies_batch(request: Request, movies: List[MovieCreate]):
+    if not movies:
+        raise HTTPException(status_code=400, detail="La lista de películas está vacía.")
+    if len(movies) > CATALOG_MAX_BATCH_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Máximo {CATALOG_MAX_BATCH_ITEMS} películas por lote.",
+        )
+
+    query_insert = """
+        EXEC cinema.movies_insert_batch ?
+    """
+    # El TVP viaja como un único parámetro: una ida y vuelta y una transacción para todo el lote.
+    # pyodbc necesita el nombre del tipo y su esquema al inicio: el tipo no está en dbo.
+    rows = [(ordinal, movie.title, movie.genres) for ordinal, movie in enumerate(movies)]
+    tvp = [MOVIE_INSERT_LIST_TYPE, MOVIE_INSERT_LIST_SCHEMA, *rows]
+
+    try:
+        result = await execute_query(query_insert, (tvp,), needs_commit=True)
+
+        if len(result) != len(movies):
+            raise HTTPException(status_code=500, detail="No se pudieron obtener los IDs insertados.")
+        inserted_ids = [row[0] for row in result.rows]
+        logger.info("%d películas insertadas en lote", len(inserted_ids))
+        for movie_id, movie in zip(inserted_ids, movies):
+            index_movie(movie_id, movie.title, movie.genres)
+            record_movie(movie_id, movie.title, movie.genres)
+
+        await invalidate_catalog_cache(*(movie.genres for movie in movies))
+
+        return {
+            "message": "Películas agregadas correctamente.",
+            "movieIds": inserted_ids,
+            "movies": [
+                {"movieId": movie_id, "title": movie.title, "genres": movie.genres}
+                for movie_id, movie in zip(inserted_ids, movies)
+            ],
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error al agregar películas en lote: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error al agregar películas en lote: {str(e)}")
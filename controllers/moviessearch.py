@@ -0,0 +1,143 @@
+import os
+import asyncio
+import logging
+from fastapi import HTTPException
+from typing import Optional
+
+from utils.database import stream_query
+from utils.search_index import TitleSearchIndex
+from utils.serialization import RawJSONResponse, dumps_bytes
+from utils.singleflight import single_flight
+
+logger = logging.getLogger(__name__)
+
+SEARCH_DEFAULT_LIMIT = 10
+SEARCH_MAX_LIMIT = 50
+SEARCH_MAX_QUERY_LENGTH = 200
+SEARCH_RETRY_AFTER = 5
+# Ids por debajo del último cargado que se releen en cada puesta al día (altas confirmadas tarde).
+SEARCH_RESCAN_WINDOW = int(os.getenv("SEARCH_RESCAN_WINDOW", "1000"))
+# Si la construcción falla (p. ej. BD inaccesible al arrancar) se reintenta con espera exponencial.
+SEARCH_BUILD_RETRY_SECONDS = 2
+SEARCH_BUILD_RETRY_MAX_SECONDS = 60
+
+_SELECT_MOVIES = "SELECT movieId, title, genres FROM cinema.movies WHERE movieId > ? ORDER BY movieId"
+
+title_index = TitleSearchIndex(SEARCH_RESCAN_WINDOW)
+_build_task: Optional[asyncio.Task] = None
+_pending_catch_up: set = set()
+
+
+async def _load_into(index: TitleSearchIndex, after_id: int, consistent: bool = False) -> int:
+    loaded = 0
+    async for _, rows in stream_query(_SELECT_MOVIES, (after_id,), consistent=consistent):
+        loaded += index.add_many(rows)
+        # Cede el event loop entre lotes para no bloquear las peticiones durante la carga.
+        await asyncio.sleep(0)
+    return loaded
+
+
+async def build_search_index() -> None:
+    global title_index
+    index = TitleSearchIndex(SEARCH_RESCAN_WINDOW)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await _load_into(index, 0)
+    index.ready = True
+    # Las altas ocurridas durante la carga quedaron en el índice anterior; se recuperan antes del cambio.
+    await _load_into(index, index.rescan_from())
+    title_index = index
+    logger.info(
+        f"Índice de búsqueda construido: {len(index)} películas, "
+        f"{index.stats()['tokens']} términos en {loop.time() - started:.2f}s"
+    )
+
+
+async def catch_up_search_index() -> int:
+    if not title_index.ready:
+        return 0
+
+    async def load() -> int:
+        # Se llama tras un alta: el primario ya tiene las filas, una réplica podría no tenerlas aún.
+        loaded = await _load_into(title_index, title_index.rescan_from(), consistent=True)
+        if loaded:
+            logger.info(f"Índice de búsqueda actualizado con {loaded} película(s) nuevas")
+        return loaded
+
+    return await single_flight("search:catch_up", load)
+
+
+def schedule_search_catch_up() -> None:
+    # Se llama desde el listener de invalidaciones: las altas de otros workers llegan por aquí.
+    task = asyncio.get_running_loop().create_task(catch_up_search_index())
+    _pending_catch_up.add(task)
+    task.add_done_callback(_catch_up_done)
+
+
+def _catch_up_done(task: asyncio.Task) -> None:
+    _pending_catch_up.discard(task)
+    if not task.cancelled() and task.exception():
+        logger.warning(f"⚠️ Fallo al actualizar el índice de búsqueda: {task.exception()}")
+
+
+def index_movie(movie_id: int, title: str, genres: Optional[str]) -> None:
+    if title_index.ready:
+        title_index.add(movie_id, title, genres)
+
+
+async def _build_until_ready() -> None:
+    delay = SEARCH_BUILD_RETRY_SECONDS
+    while True:
+        try:
+            await build_search_index()
+            return
+        except Exception as e:
+            logger.error("❌ Error al construir el índice de búsqueda, reintento en %ds: %s", delay, e)
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, SEARCH_BUILD_RETRY_MAX_SECONDS)
+
+
+def _build_done(task: asyncio.Task) -> None:
+    global _build_task
+    if _build_task is task:
+        _build_task = None
+    if not task.cancelled() and task.exception():
+        logger.error(f"❌ Error al construir el índice de búsqueda: {task.exception()}")
+
+
+def start_search_index() -> None:
+    global _build_task
+    if _build_task is None and not title_index.ready:
+        _build_task = asyncio.get_running_loop().create_task(_build_until_ready())
+        _build_task.add_done_callback(_build_done)
+
+
+async def stop_search_index() -> None:
+    global _build_task
+    tasks = list(_pending_catch_up)
+    if _build_task is not None:
+        tasks.append(_build_task)
+        _build_task = None
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def get_search_stats() -> dict:
+    return title_index.stats()
+
+
+async def search_movies(q: str, limit: int = SEARCH_DEFAULT_LIMIT) -> RawJSONResponse:
+    if len(q) > SEARCH_MAX_QUERY_LENGTH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"La búsqueda admite como máximo {SEARCH_MAX_QUERY_LENGTH} caracteres.",
+        )
+    index = title_index
+    if not index.ready:
+        raise HTTPException(
+            status_code=503,
+            detail="El índice de búsqueda se está construyendo, intente de nuevo en unos segundos.",
+            headers={"Retry-After": str(SEARCH_RETRY_AFTER)},
+        )
+    return RawJSONResponse(dumps_bytes(index.search(q, limit)))
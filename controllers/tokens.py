@@ -0,0 +1,113 @@
+import uuid
+import logging
+from fastapi import HTTPException
+from typing import Optional
+
+from utils.redis_cache import get_redis_client
+from utils.security import (
+    create_jwt_token,
+    create_refresh_token,
+    decode_refresh_token,
+    REFRESH_TOKEN_TTL_DAYS,
+)
+from controllers.users import get_user_profile
+from models.tokenrefresh import TokenRefresh
+
+logger = logging.getLogger(__name__)
+
+REFRESH_TOKEN_TTL_MS = REFRESH_TOKEN_TTL_DAYS * 24 * 60 * 60 * 1000
+
+# Rotación atómica: solo el jti vigente de la familia puede canjearse. Presentar uno ya rotado
+# indica que el token se filtró, y se revoca la familia completa.
+_ROTATE_SCRIPT = """
+local current = redis.call('hget', KEYS[1], 'jti')
+if not current then
+    return 0
+end
+if current ~= ARGV[1] then
+    redis.call('del', KEYS[1])
+    return -1
+end
+redis.call('hset', KEYS[1], 'jti', ARGV[2])
+redis.call('pexpire', KEYS[1], ARGV[3])
+return 1
+"""
+
+
+def _family_key(family: str) -> str:
+    return f"auth:refresh:{family}"
+
+
+async def issue_refresh_token(email: str) -> Optional[str]:
+    redis_client = get_redis_client()
+    if not redis_client:
+        logger.warning("Redis no disponible, login sin refresh token.")
+        return None
+
+    family = uuid.uuid4().hex
+    jti = uuid.uuid4().hex
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.hset(_family_key(family), mapping={"jti": jti, "email": email})
+        pipe.pexpire(_family_key(family), REFRESH_TOKEN_TTL_MS)
+        await pipe.execute()
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo registrar el refresh token de {email}: {str(e)}")
+        return None
+    return create_refresh_token(email, family, jti)
+
+
+async def refresh_access_token(body: TokenRefresh) -> dict:
+    payload = decode_refresh_token(body.refresh_token)
+    redis_client = get_redis_client()
+    if not redis_client:
+        raise HTTPException(status_code=503, detail="Servicio de refresco de tokens no disponible.")
+
+    email = payload["email"]
+    family = payload["fam"]
+    new_jti = uuid.uuid4().hex
+    try:
+        rotated = await redis_client.eval(
+            _ROTATE_SCRIPT, 1, _family_key(family), payload["jti"], new_jti, REFRESH_TOKEN_TTL_MS
+        )
+    except Exception as e:
+        logger.error(f"Error al rotar el refresh token de {email}: {e}", exc_info=True)
+        raise HTTPException(status_code=503, detail="Servicio de refresco de tokens no disponible.")
+
+    if rotated == -1:
+        logger.warning(f"Reutilización de refresh token detectada para {email}; familia {family} revocada")
+        raise HTTPException(status_code=401, detail="Refresh token revocado.")
+    if rotated != 1:
+        raise HTTPException(status_code=401, detail="Refresh token revocado.")
+
+    # El perfil sale de la caché de usuarios: un usuario desactivado no obtiene tokens nuevos.
+    user_data = await get_user_profile(email)
+    if user_data is None or not user_data["is_active"]:
+        await redis_client.delete(_family_key(family))
+        raise HTTPException(status_code=403, detail="Usuario inactivo")
+
+    return {
+        "message": "Token renovado exitosamente",
+        "token": create_jwt_token(
+            email=user_data["email"],
+            active=user_data["is_active"],
+            admin=user_data["is_admin"]
+        ),
+        "refresh_token": create_refresh_token(email, family, new_jti),
+    }
+
+
+async def revoke_refresh_token(body: TokenRefresh) -> dict:
+    payload = decode_refresh_token(body.refresh_token)
+    redis_client = get_redis_client()
+    if not redis_client:
+        raise HTTPException(status_code=503, detail="Servicio de refresco de tokens no disponible.")
+
+    try:
+        await redis_client.delete(_family_key(payload["fam"]))
+    except Exception as e:
+        logger.error(f"Error al revocar el refresh token de {payload['email']}: {e}", exc_info=True)
+        raise HTTPException(status_code=503, detail="Servicio de refresco de tokens no disponible.")
+    logger.info(f"Refresh token revocado para {payload['email']}")
+    return {"message": "Refresh token revocado correctamente."}
+
@@ -0,0 +1,117 @@
+import os
+import logging
+from fastapi import HTTPException, Request
+from typing import Optional
+
+from utils.database import execute_query
+from utils.local_cache import LocalCache
+from utils.metrics import register_cache_stats
+from utils.redis_cache import (
+    get_redis_client,
+    get_or_fill,
+    prime_cache,
+    invalidate_tags,
+    add_invalidation_handler,
+)
+from utils.security import validateadmin
+from models.userupdate import UserFlagsUpdate
+
+logger = logging.getLogger(__name__)
+
+USER_PROFILE_TTL = int(os.getenv("USER_PROFILE_TTL", "900"))
+USER_PROFILE_L1_MAX_ENTRIES = int(os.getenv("USER_PROFILE_L1_MAX_ENTRIES", "4096"))
+USER_PROFILE_L1_TTL = float(os.getenv("USER_PROFILE_L1_TTL", "30"))
+# Emails sin usuario: se recuerdan poco tiempo en la caché local para no ir a la BD en cada login fallido.
+USER_PROFILE_NEGATIVE_TTL = float(os.getenv("USER_PROFILE_NEGATIVE_TTL", "5"))
+
+_SELECT_PROFILE = """
+    SELECT uid, email, is_active, is_admin
+    FROM cinema.users
+    WHERE email = ?
+"""
+
+users_l1 = LocalCache("users_l1", max_entries=USER_PROFILE_L1_MAX_ENTRIES, ttl=USER_PROFILE_L1_TTL)
+_UNKNOWN_USER = object()
+register_cache_stats(users_l1.stats)
+add_invalidation_handler(users_l1.invalidate_tags)
+
+
+def _normalize_email(email: str) -> str:
+    return email.strip().lower()
+
+
+def _profile_key(email: str) -> str:
+    return f"users:profile:{_normalize_email(email)}"
+
+
+def _profile_tags(email: str) -> list:
+    return [f"user:{_normalize_email(email)}"]
+
+
+async def get_user_profile(email: str) -> Optional[dict]:
+    cache_key = _profile_key(email)
+    profile = users_l1.get(cache_key)
+    if profile is _UNKNOWN_USER:
+        return None
+    if profile is not None:
+        return profile
+
+    async def load():
+        # Flags de acceso: siempre del primario, una réplica atrasada dejaría en caché permisos ya revocados.
+        result = await execute_query(_SELECT_PROFILE, (email,), consistent=True)
+        logger.debug("Resultado de la consulta: %d fila(s)", len(result))
+        return result.as_dicts()[0] if result.rows else None
+
+    tags = _profile_tags(email)
+    profile = await get_or_fill(get_redis_client(), cache_key, load, USER_PROFILE_TTL, tags=tags)
+    if profile is not None:
+        users_l1.set(cache_key, profile, tags=tags)
+    elif USER_PROFILE_NEGATIVE_TTL > 0:
+        users_l1.set(cache_key, _UNKNOWN_USER, ttl=USER_PROFILE_NEGATIVE_TTL, tags=tags)
+    return profile
+
+
+async def prime_user_profile(profile: dict) -> None:
+    cache_key = _profile_key(profile["email"])
+    tags = _profile_tags(profile["email"])
+    users_l1.set(cache_key, profile, tags=tags)
+    await prime_cache(get_redis_client(), cache_key, profile, USER_PROFILE_TTL, tags=tags)
+
+
+async def invalidate_user_profile(email: str) -> None:
+    tags = _profile_tags(email)
+    users_l1.invalidate_tags(tags)
+    await invalidate_tags(get_redis_client(), tags)
+    logger.info("Perfil de usuario invalidado en caché: %s", _normalize_email(email))
+
+
+def get_user_cache_stats() -> dict:
+    return users_l1.stats()
+
+
+@validateadmin
+async def update_user_flags(request: Request, email: str, flags: UserFlagsUpdate):
+    if flags.is_active is None and flags.is_admin is None:
+        raise HTTPException(status_code=400, detail="Debe indicar is_active y/o is_admin.")
+
+    query = """
+        EXEC cinema.users_update_flags ?, ?, ?
+    """
+    try:
+        result = await execute_query(query, (email, flags.is_active, flags.is_admin), needs_commit=True)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error al actualizar el usuario {email}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error al actualizar usuario: {str(e)}")
+
+    if not result.rows:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado en base de datos.")
+
+    # La fila en caché deja de ser válida en todos los workers antes de responder.
+    await invalidate_user_profile(email)
+    profile = result.as_dicts()[0]
+    logger.info(
+        "Usuario %s actualizado: is_active=%s, is_admin=%s", email, profile["is_active"], profile["is_admin"]
+    )
+    return {"message": "Usuario actualizado correctamente.", "user": profile}
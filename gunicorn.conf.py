@@ -0,0 +1,48 @@
+# Modo producción: gunicorn -c gunicorn.conf.py main:app
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from utils.server import (
+    SERVER_HOST,
+    SERVER_PORT,
+    SERVER_PRELOAD,
+    GRACEFUL_TIMEOUT,
+    KEEPALIVE,
+    worker_count,
+    preload_shared_state,
+)
+
+if SERVER_PRELOAD:
+    # Los exportadores de telemetría arrancan hilos: con preload se configuran en cada worker tras el fork.
+    os.environ.setdefault("TELEMETRY_INIT", "worker")
+
+bind = f"{SERVER_HOST}:{SERVER_PORT}"
+workers = worker_count()
+worker_class = "utils.server.ProductionWorker"
+preload_app = SERVER_PRELOAD
+graceful_timeout = GRACEFUL_TIMEOUT
+# El worker ASGI avisa al maestro desde su event loop; un loop bloqueado más de esto se reinicia.
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+keepalive = KEEPALIVE
+# Los proxies de confianza para X-Forwarded-For los aplica ProductionWorker (TRUSTED_PROXY_IPS en
+# utils/server.py): admite redes CIDR, como la del front-end de App Service.
+max_requests = int(os.getenv("MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", "0"))
+accesslog = None
+errorlog = "-"
+
+
+def when_ready(server):
+    # Con preload_app la app ya está importada en el maestro y aún no hay workers.
+    if SERVER_PRELOAD:
+        preload_shared_state()
+    server.log.info(f"Workers: {workers} ({worker_class}), graceful_timeout={graceful_timeout}s")
+
+
+def post_fork(server, worker):
+    if os.environ.get("TELEMETRY_INIT") == "worker":
+        import main
+
+        main.setup_telemetry()
@@ -1,68 +1,218 @@
-import uvicorn
+import time
+
+_import_started = time.perf_counter()
+
+import os
+import asyncio
 import logging
-from fastapi import FastAPI, Depends, HTTPException, Request
 from dotenv import load_dotenv
-from typing import Optional
+
+# Una sola lectura del .env, antes de importar los módulos que leen su configuración al cargarse.
+load_dotenv()
+
+from fastapi import FastAPI, Depends, HTTPException, Request, Query, Header
+from typing import Optional, List
 from contextlib import asynccontextmanager
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import PlainTextResponse
+
+from utils.logging_config import setup_logging, RequestIdMiddleware
+
+# Antes de importar los controladores, para que sus logs pasen por la cola desde el inicio.
+setup_logging()
 
 from controllers.firebase import register_user_firebase, login_user_firebase
-from controllers.moviescatalog import get_movies_catalog, add_movie
+from controllers.moviescatalog import (
+    get_movies_catalog,
+    export_movies_catalog,
+    add_movie,
+    add_movies_batch,
+    catalog_l1,
+    start_catalog_warmup,
+    stop_catalog_warmup,
+    CATALOG_PAGE_SIZE,
+    CATALOG_MAX_PAGE_SIZE,
+)
+from controllers.moviessearch import (
+    search_movies,
+    start_search_index,
+    stop_search_index,
+    get_search_stats,
+    SEARCH_DEFAULT_LIMIT,
+    SEARCH_MAX_LIMIT,
+)
+from controllers.catalogstats import get_catalog_stats, start_catalog_stats, stop_catalog_stats
+from controllers.tokens import refresh_access_token, revoke_refresh_token
+from controllers.users import update_user_flags, get_user_cache_stats
+from controllers.catalogimport import import_movies_upload, IMPORT_BATCH_SIZE, IMPORT_MAX_BATCH_SIZE
 from models.userregister import UserRegister
 from models.userlogin import UserLogin
-from models.moviescatalog import MovieCatalog
-from utils.security import decode_jwt_token
+from models.userupdate import UserFlagsUpdate
+from models.tokenrefresh import TokenRefresh
+from models.moviescatalog import MovieCatalog, MovieCreate
+from utils.security import get_request_claims, get_auth_cache_stats
+from utils.rate_limit import rate_limit
 from utils.telemetry import init_telemetry, instrument_fastapi_app
+from utils.metrics import render_prometheus
+from utils.database import init_db_pool, close_db_pool, get_pool_stats
+from utils.redis_cache import (
+    init_redis,
+    close_redis,
+    get_cache_stats,
+    start_invalidation_listener,
+    stop_invalidation_listener,
+    cancel_pending_refreshes,
+)
+from utils.firebase_client import init_firebase_client, init_firebase_admin, close_firebase_client
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-load_dotenv()
+# Milisegundos por etapa del arranque (importación y cada cliente externo); ver scripts/profile_startup.py.
+startup_timings: dict = {}
+
+async def _timed(name: str, awaitable):
+    started = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        startup_timings[name] = round((time.perf_counter() - started) * 1000, 1)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("API starting up...")
+    started = time.perf_counter()
+    # Los clientes externos se crean aquí y en paralelo, nunca al importar los módulos.
+    await asyncio.gather(
+        _timed("database", init_db_pool()),
+        _timed("redis", init_redis()),
+        _timed("firebase_http", init_firebase_client()),
+        _timed("firebase_admin", init_firebase_admin()),
+    )
+    startup_timings["lifespan"] = round((time.perf_counter() - started) * 1000, 1)
+    logger.info(f"Startup timings (ms): {startup_timings}")
+    start_invalidation_listener()
+    start_search_index()
+    start_catalog_stats()
+    start_catalog_warmup()
     yield
     logger.info("API shutting down...")
+    await stop_search_index()
+    await stop_catalog_stats()
+    await stop_catalog_warmup()
+    await cancel_pending_refreshes()
+    await stop_invalidation_listener()
+    await close_firebase_client()
+    await close_redis()
+    await close_db_pool()
 
 app = FastAPI(
     title="Movies API",
     version="1.0.0",
     lifespan=lifespan,
 )
+app.add_middleware(RequestIdMiddleware)
+
+def setup_telemetry() -> bool:
+    try:
+        enabled = init_telemetry()
+        if enabled:
+            instrument_fastapi_app(app)
+            logger.info("Telemetry enabled and FastAPI instrumented.")
+        else:
+            logger.warning("Telemetry not enabled due to missing config.")
+        return enabled
+    except Exception as e:
+        logger.error(f"Telemetry initialization failed: {e}")
+        return False
 
-try:
-    telemetry_ok = init_telemetry()
-    if telemetry_ok:
-        instrument_fastapi_app(app)
-        logger.info("Telemetry enabled and FastAPI instrumented.")
-    else:
-        logger.warning("Telemetry not enabled due to missing config.")
-except Exception as e:
-    logger.error(f"Telemetry initialization failed: {e}")
+# Con gunicorn --preload la app se importa en el maestro; la telemetría se configura en cada worker
+# (post_fork en gunicorn.conf.py) porque sus exportadores corren en hilos que no sobreviven al fork.
+if os.getenv("TELEMETRY_INIT", "import") == "worker":
+    telemetry_ok = bool(os.getenv("APPINSIGHTS_CONNECTION_STRING"))
+else:
+    telemetry_ok = setup_telemetry()
 
 security = HTTPBearer()
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
-    user = decode_jwt_token(token)
+async def get_current_user(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)):
+    user = get_request_claims(request, credentials.credentials)
     if not user:
         raise HTTPException(status_code=401, detail="Token inválido")
     return user
 
-@app.post("/signup")
+@app.post("/signup", dependencies=[Depends(rate_limit("signup"))])
 async def signup(user: UserRegister):
     return await register_user_firebase(user)
 
-@app.post("/login")
+@app.post("/login", dependencies=[Depends(rate_limit("login"))])
 async def login(user: UserLogin):
     return await login_user_firebase(user)
 
-@app.get("/catalog")
-async def catalog(category: Optional[str] = None, current_user: dict = Depends(get_current_user)):
-    return await get_movies_catalog(category)
+@app.post("/token/refresh", dependencies=[Depends(rate_limit("token"))])
+async def token_refresh(body: TokenRefresh):
+    return await refresh_access_token(body)
+
+@app.post("/token/revoke", dependencies=[Depends(rate_limit("token"))])
+async def token_revoke(body: TokenRefresh):
+    return await revoke_refresh_token(body)
+
+@app.patch("/users/{email}", dependencies=[Depends(rate_limit("users_write"))])
+async def patch_user(
+    email: str,
+    flags: UserFlagsUpdate,
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    return await update_user_flags(request=request, email=email, flags=flags)
+
+@app.get("/catalog", response_model=List[MovieCatalog], dependencies=[Depends(rate_limit("catalog"))])
+async def catalog(
+    category: Optional[str] = None,
+    page_size: int = Query(CATALOG_PAGE_SIZE, ge=1, le=CATALOG_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    genre: Optional[List[str]] = Query(None),
+    match: str = Query("any", pattern="^(any|all)$"),
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user)
+):
+    return await get_movies_catalog(
+        category,
+        page_size=page_size,
+        cursor=cursor,
+        genres=genre,
+        match=match,
+        if_none_match=if_none_match,
+        accept_encoding=accept_encoding,
+    )
+
+@app.get("/catalog/search", response_model=List[MovieCatalog], dependencies=[Depends(rate_limit("search"))])
+async def catalog_search(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(SEARCH_DEFAULT_LIMIT, ge=1, le=SEARCH_MAX_LIMIT),
+    current_user: dict = Depends(get_current_user)
+):
+    return await search_movies(q, limit=limit)
+
+@app.get("/catalog/stats", dependencies=[Depends(rate_limit("stats"))])
+async def catalog_stats(
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user)
+):
+    return await get_catalog_stats(if_none_match=if_none_match, accept_encoding=accept_encoding)
 
-@app.post("/catalog")
+@app.get("/catalog/export", dependencies=[Depends(rate_limit("export"))])
+async def catalog_export(
+    category: Optional[str] = None,
+    format: str = Query("ndjson", pattern="^(ndjson|json)$"),
+    genre: Optional[List[str]] = Query(None),
+    match: str = Query("any", pattern="^(any|all)$"),
+    current_user: dict = Depends(get_current_user)
+):
+    return await export_movies_catalog(category, output_format=format, genres=genre, match=match)
+
+@app.post("/catalog", dependencies=[Depends(rate_limit("catalog_write"))])
 async def create_movie(
     movie: MovieCatalog,
     request: Request,
@@ -70,13 +220,74 @@ async def create_movie(
 ):
     return await add_movie(movie=movie, request=request)
 
+@app.post("/catalog/batch", dependencies=[Depends(rate_limit("catalog_write"))])
+async def create_movies_batch(
+    movies: List[MovieCreate],
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    return await add_movies_batch(movies=movies, request=request)
+
+@app.post("/catalog/import", dependencies=[Depends(rate_limit("import"))])
+async def import_catalog(
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    batch_size: int = Query(IMPORT_BATCH_SIZE, ge=1, le=IMPORT_MAX_BATCH_SIZE),
+    current_user: dict = Depends(get_current_user)
+):
+    return await import_movies_upload(request=request, input_format=format, batch_size=batch_size)
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "version": "1.0.0"}
 
+@app.get("/health/db")
+async def health_db():
+    return get_pool_stats()
+
+@app.get("/health/cache")
+async def health_cache():
+    return {
+        "l1": catalog_l1.stats(),
+        "users_l1": get_user_cache_stats(),
+        "redis": get_cache_stats(),
+        "search": get_search_stats(),
+        "auth": get_auth_cache_stats(),
+    }
+
+async def metrics():
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+if not telemetry_ok:
+    # Sin Application Insights, las mismas métricas quedan disponibles para un scrape local.
+    app.add_api_route("/metrics", metrics, methods=["GET"], include_in_schema=False)
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to the Movies API"}
 
+startup_timings["import"] = round((time.perf_counter() - _import_started) * 1000, 1)
+
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, log_level="info")
\ No newline at end of file
+    # Desarrollo o plataformas sin gunicorn (Windows). En producción: gunicorn -c gunicorn.conf.py main:app
+    import uvicorn
+    from utils.server import (
+        SERVER_HOST,
+        SERVER_PORT,
+        GRACEFUL_TIMEOUT,
+        SHUTDOWN_MARGIN,
+        TRUSTED_PROXY_IPS,
+        worker_count,
+    )
+
+    uvicorn.run(
+        "main:app",
+        host=SERVER_HOST,
+        port=SERVER_PORT,
+        workers=worker_count() if os.getenv("WEB_CONCURRENCY") else 1,
+        loop="auto",
+        http="auto",
+        timeout_graceful_shutdown=max(1, GRACEFUL_TIMEOUT - SHUTDOWN_MARGIN),
+        forwarded_allow_ips=TRUSTED_PROXY_IPS,
+        log_level="info",
+    )
\ No newline at end of file
@@ -0,0 +1,104 @@
+-- Índice normalizado de géneros: crea cinema.genres / cinema.movie_genres,
+-- los procedimientos de sincronización y rellena las filas existentes.
+-- Es idempotente: puede ejecutarse de nuevo sin duplicar datos.
+
+IF OBJECT_ID('cinema.genres', 'U') IS NULL
+BEGIN
+    CREATE TABLE cinema.genres (
+        genreId INT IDENTITY(1,1) PRIMARY KEY,
+        name NVARCHAR(255) NOT NULL,
+        CONSTRAINT UQ_genres_name UNIQUE (name)
+    );
+END;
+GO
+
+IF OBJECT_ID('cinema.movie_genres', 'U') IS NULL
+BEGIN
+    CREATE TABLE cinema.movie_genres (
+        genreId INT NOT NULL REFERENCES cinema.genres (genreId),
+        movieId INT NOT NULL REFERENCES cinema.movies (movieId),
+        CONSTRAINT PK_movie_genres PRIMARY KEY CLUSTERED (genreId, movieId)
+    );
+END;
+GO
+
+IF NOT EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_movie_genres_movieId' AND object_id = OBJECT_ID('cinema.movie_genres')
+)
+BEGIN
+    CREATE INDEX IX_movie_genres_movieId ON cinema.movie_genres (movieId) INCLUDE (genreId);
+END;
+GO
+
+CREATE OR ALTER PROCEDURE cinema.movie_genres_sync
+    @movieId INT
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    DECLARE @names TABLE (name NVARCHAR(255) PRIMARY KEY);
+
+    INSERT INTO @names (name)
+    SELECT DISTINCT LTRIM(RTRIM(s.value))
+    FROM cinema.movies m
+    CROSS APPLY STRING_SPLIT(m.genres, '|') s
+    WHERE m.movieId = @movieId
+      AND LTRIM(RTRIM(s.value)) <> '';
+
+    INSERT INTO cinema.genres (name)
+    SELECT n.name
+    FROM @names n
+    WHERE NOT EXISTS (SELECT 1 FROM cinema.genres g WHERE g.name = n.name);
+
+    DELETE FROM cinema.movie_genres WHERE movieId = @movieId;
+
+    INSERT INTO cinema.movie_genres (genreId, movieId)
+    SELECT g.genreId, @movieId
+    FROM @names n
+    JOIN cinema.genres g ON g.name = n.name;
+END;
+GO
+
+CREATE OR ALTER PROCEDURE cinema.movies_insert
+    @title NVARCHAR(255),
+    @genres NVARCHAR(255)
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    DECLARE @movieId INT;
+
+    INSERT INTO cinema.movies (title, genres)
+    VALUES (@title, @genres);
+
+    SET @movieId = SCOPE_IDENTITY();
+
+    EXEC cinema.movie_genres_sync @movieId;
+
+    SELECT @movieId AS movieId;
+END;
+GO
+
+-- Backfill de las filas existentes en cinema.movies.
+SET NOCOUNT ON;
+
+INSERT INTO cinema.genres (name)
+SELECT DISTINCT LTRIM(RTRIM(s.value))
+FROM cinema.movies m
+CROSS APPLY STRING_SPLIT(m.genres, '|') s
+WHERE LTRIM(RTRIM(s.value)) <> ''
+  AND NOT EXISTS (
+      SELECT 1 FROM cinema.genres g WHERE g.name = LTRIM(RTRIM(s.value))
+  );
+
+INSERT INTO cinema.movie_genres (genreId, movieId)
+SELECT DISTINCT g.genreId, m.movieId
+FROM cinema.movies m
+CROSS APPLY STRING_SPLIT(m.genres, '|') s
+JOIN cinema.genres g ON g.name = LTRIM(RTRIM(s.value))
+WHERE NOT EXISTS (
+    SELECT 1 FROM cinema.movie_genres mg
+    WHERE mg.genreId = g.genreId AND mg.movieId = m.movieId
+);
+GO
@@ -0,0 +1,31 @@
+-- Procedimiento de backfill por rango usado por la importación masiva:
+-- sincroniza cinema.movie_genres para las películas con movieId > @fromMovieId.
+
+CREATE OR ALTER PROCEDURE cinema.movie_genres_backfill
+    @fromMovieId INT = 0
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    INSERT INTO cinema.genres (name)
+    SELECT DISTINCT LTRIM(RTRIM(s.value))
+    FROM cinema.movies m
+    CROSS APPLY STRING_SPLIT(m.genres, '|') s
+    WHERE m.movieId > @fromMovieId
+      AND LTRIM(RTRIM(s.value)) <> ''
+      AND NOT EXISTS (
+          SELECT 1 FROM cinema.genres g WHERE g.name = LTRIM(RTRIM(s.value))
+      );
+
+    INSERT INTO cinema.movie_genres (genreId, movieId)
+    SELECT DISTINCT g.genreId, m.movieId
+    FROM cinema.movies m
+    CROSS APPLY STRING_SPLIT(m.genres, '|') s
+    JOIN cinema.genres g ON g.name = LTRIM(RTRIM(s.value))
+    WHERE m.movieId > @fromMovieId
+      AND NOT EXISTS (
+          SELECT 1 FROM cinema.movie_genres mg
+          WHERE mg.genreId = g.genreId AND mg.movieId = m.movieId
+      );
+END;
+GO
@@ -0,0 +1,48 @@
+-- Inserción por lotes en una sola ida y vuelta mediante un parámetro con valores de tabla (TVP).
+
+IF TYPE_ID('cinema.movie_insert_list') IS NULL
+BEGIN
+    CREATE TYPE cinema.movie_insert_list AS TABLE (
+        ord INT NOT NULL PRIMARY KEY,
+        title NVARCHAR(255) NOT NULL,
+        genres NVARCHAR(255) NULL
+    );
+END;
+GO
+
+CREATE OR ALTER PROCEDURE cinema.movies_insert_batch
+    @movies cinema.movie_insert_list READONLY
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    DECLARE @ids TABLE (ord INT PRIMARY KEY, movieId INT NOT NULL);
+
+    -- MERGE permite devolver el ordinal de origen junto al IDENTITY generado.
+    MERGE INTO cinema.movies AS target
+    USING @movies AS source
+    ON 1 = 0
+    WHEN NOT MATCHED THEN
+        INSERT (title, genres) VALUES (source.title, source.genres)
+    OUTPUT source.ord, INSERTED.movieId INTO @ids (ord, movieId);
+
+    INSERT INTO cinema.genres (name)
+    SELECT DISTINCT LTRIM(RTRIM(s.value))
+    FROM @movies m
+    CROSS APPLY STRING_SPLIT(m.genres, '|') s
+    WHERE LTRIM(RTRIM(s.value)) <> ''
+      AND NOT EXISTS (
+          SELECT 1 FROM cinema.genres g WHERE g.name = LTRIM(RTRIM(s.value))
+      );
+
+    INSERT INTO cinema.movie_genres (genreId, movieId)
+    SELECT DISTINCT g.genreId, i.movieId
+    FROM @ids i
+    JOIN @movies m ON m.ord = i.ord
+    CROSS APPLY STRING_SPLIT(m.genres, '|') s
+    JOIN cinema.genres g ON g.name = LTRIM(RTRIM(s.value));
+
+    SELECT movieId FROM @ids ORDER BY ord;
+END;
+GO
@@ -0,0 +1,17 @@
+-- Cambio de is_active / is_admin; devuelve la fila actualizada para invalidar la caché de perfiles.
+
+CREATE OR ALTER PROCEDURE cinema.users_update_flags
+    @email VARCHAR(255),
+    @is_active BIT = NULL,
+    @is_admin BIT = NULL
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    UPDATE cinema.users
+    SET is_active = COALESCE(@is_active, is_active),
+        is_admin = COALESCE(@is_admin, is_admin)
+    OUTPUT INSERTED.uid, INSERTED.email, INSERTED.is_active, INSERTED.is_admin
+    WHERE email = @email;
+END;
+GO
@@ -1,6 +1,10 @@
 from pydantic import BaseModel, Field, field_validator
 from typing import Optional
 
+# Longitudes de cinema.movies (NVARCHAR(255)): un valor más largo haría fallar el INSERT completo del lote.
+TITLE_MAX_LENGTH = 255
+GENRES_MAX_LENGTH = 255
+
 class MovieCatalog(BaseModel):
     movieId: Optional[int] = Field(
         default=None,
@@ -10,10 +14,12 @@ class MovieCatalog(BaseModel):
     title: str = Field(
         ...,
         min_length=1,
+        max_length=TITLE_MAX_LENGTH,
     )
 
     genres: Optional[str] = Field(
         default=None,
+        max_length=GENRES_MAX_LENGTH,
     )
 
     @field_validator("title")
@@ -24,5 +30,12 @@ class MovieCatalog(BaseModel):
         return v
 
 class MovieCreate(BaseModel):
-    title: str = Field(..., min_length=1)
-    genres: str = Field(..., min_length=1) 
+    title: str = Field(..., min_length=1, max_length=TITLE_MAX_LENGTH)
+    genres: str = Field(..., min_length=1, max_length=GENRES_MAX_LENGTH)
+
+    @field_validator("title", "genres")
+    @classmethod
+    def validate_not_blank(cls, v):
+        if not v.strip():
+            raise ValueError("El valor no puede estar vacío o en blanco")
+        return v
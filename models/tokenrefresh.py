@@ -0,0 +1,7 @@
+from pydantic import BaseModel, Field
+
+class TokenRefresh(BaseModel):
+    refresh_token: str = Field(
+        ...,
+        min_length=1,
+    )
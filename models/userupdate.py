@@ -0,0 +1,11 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+class UserFlagsUpdate(BaseModel):
+    is_active: Optional[bool] = Field(
+        default=None,
+    )
+
+    is_admin: Optional[bool] = Field(
+        default=None,
+    )
@@ -0,0 +1,133 @@
+import os
+import sys
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+# Los módulos de utils leen su configuración al importarse: el .env se carga antes.
+load_dotenv()
+
+# Una réplica sin nada escuchando (puerto 1) para provocar la expulsión y el paso al siguiente destino.
+UNREACHABLE_REPLICA = "127.0.0.1,1"
+PIN_WINDOW = 0.5
+
+
+def configure(primary: str, replica: str) -> None:
+    os.environ["SQLSERVER"] = primary
+    os.environ["SQL_READ_REPLICAS"] = f"{replica}|{UNREACHABLE_REPLICA}"
+    os.environ["SQL_REPLICA_MAX_FAILURES"] = "1"
+    os.environ["SQL_REPLICA_EJECT_SECONDS"] = "60"
+    os.environ["SQL_REPLICA_CONNECT_TIMEOUT"] = "2"
+    os.environ["SQL_READ_YOUR_WRITES_WINDOW"] = str(PIN_WINDOW)
+    os.environ["SQL_POOL_MIN_SIZE"] = "1"
+
+
+def acquire_counts(db) -> dict:
+    pools = [db.get_pool(), *db.get_router().pools]
+    return {pool.name: pool.stats()["acquire_count"] for pool in pools}
+
+
+async def served_by(db, read, times: int = 1) -> dict:
+    # Qué pools atendieron las lecturas: conexiones entregadas por cada uno antes y después.
+    before = acquire_counts(db)
+    for _ in range(times):
+        await read()
+    after = acquire_counts(db)
+    return {name: after[name] - before[name] for name in after if after[name] != before[name]}
+
+
+async def run(write_sql: str) -> list:
+    from utils import database as db
+
+    results = []
+
+    def check(name: str, ok: bool, detail) -> None:
+        results.append(ok)
+        print(f"{'OK   ' if ok else 'FALLO'} {name}: {detail}")
+
+    async def read():
+        await db.execute_query("SELECT 1 AS n")
+
+    await db.init_db_pool()
+    try:
+        router = db.get_router()
+        replica, unreachable = router.pools
+
+        healthy = {item["name"]: item["healthy"] for item in router.stats()["replicas"]}
+        check("expulsión al arrancar", healthy == {replica.name: True, unreachable.name: False}, healthy)
+
+        served = await served_by(db, read, 6)
+        check("lecturas a la réplica sana", served == {replica.name: 6}, served)
+
+        served = await served_by(db, lambda: db.execute_query("SELECT 1 AS n", consistent=True), 2)
+        check("consistent=True al primario", served == {"primary": 2}, served)
+
+        async def stream():
+            async for _ in db.stream_query("SELECT 1 AS n"):
+                pass
+
+        served = await served_by(db, stream, 2)
+        check("stream_query a la réplica", served == {replica.name: 2}, served)
+
+        # La réplica inalcanzable vuelve a rotación como si hubiera pasado su expulsión: la lectura que
+        # le toque falla al conectar, pasa a la réplica sana y la expulsa de nuevo.
+        router._ejected_until[unreachable.name] = 0.0
+        failovers = router.stats()["failovers"]
+        served = await served_by(db, read, 4)
+        stats = router.stats()
+        check(
+            "paso a la siguiente réplica",
+            served.get(replica.name) == 4 and stats["failovers"] > failovers,
+            {"served": served, "failovers": stats["failovers"] - failovers},
+        )
+        healthy = {item["name"]: item["healthy"] for item in stats["replicas"]}
+        check("réplica caída expulsada otra vez", not healthy[unreachable.name], healthy)
+
+        async def request_with_write():
+            await db.execute_query(write_sql, needs_commit=True)
+            return await served_by(db, read, 2)
+
+        served = await asyncio.create_task(request_with_write())
+        check("lecturas tras escribir, misma petición", served == {"primary": 2}, served)
+        served = await asyncio.create_task(served_by(db, read, 2))
+        check("otras peticiones siguen en la réplica", served == {replica.name: 2}, served)
+
+        db.pin_reads_to_primary(["catalog:all"])
+        pinned, unrelated = db.reads_pinned(["catalog:all"]), db.reads_pinned(["genre:drama"])
+        check("tag invalidado fijado al primario", pinned and not unrelated, {"catalog:all": pinned, "genre:drama": unrelated})
+        await asyncio.sleep(PIN_WINDOW + 0.1)
+        check("fijación vencida", not db.reads_pinned(["catalog:all"]), db.reads_pinned(["catalog:all"]))
+    finally:
+        await db.close_db_pool()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Prueba el enrutado a réplicas contra dos servidores reales: reparto de lecturas, expulsión, "
+            "paso al siguiente destino y lecturas al primario tras una escritura."
+        )
+    )
+    parser.add_argument("--primary", default=os.getenv("SQLSERVER"), help="servidor primario (por defecto SQLSERVER)")
+    parser.add_argument("--replica", required=True, help="réplica: nombre de servidor o cadena de conexión completa")
+    parser.add_argument(
+        "--write-sql",
+        default="DECLARE @noop int = 1",
+        help="sentencia ejecutada con commit para simular una escritura (por defecto no modifica datos)",
+    )
+    args = parser.parse_args()
+    if not args.primary:
+        parser.error("indique --primary o defina SQLSERVER")
+
+    configure(args.primary, args.replica)
+    results = asyncio.run(run(args.write_sql))
+    print(f"\n{sum(results)}/{len(results)} comprobaciones correctas")
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import os
+import sys
+import json
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+# Los módulos de utils leen su configuración al importarse: el .env se carga antes.
+load_dotenv()
+
+from controllers.catalogimport import import_movies, file_chunks, IMPORT_BATCH_SIZE, IMPORT_MAX_BATCH_SIZE
+from utils.database import init_db_pool, close_db_pool
+from utils.redis_cache import init_redis, close_redis
+
+
+async def run(path: str, input_format: str, batch_size: int) -> dict:
+    await asyncio.gather(init_db_pool(), init_redis())
+    try:
+        return await import_movies(file_chunks(path), input_format, batch_size)
+    finally:
+        await close_redis()
+        await close_db_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importación masiva de películas a cinema.movies.")
+    parser.add_argument("file", help="Ruta del archivo CSV o NDJSON (p. ej. csv/movies.csv)")
+    parser.add_argument("--format", choices=["csv", "ndjson"], default=None,
+                        help="Formato del archivo; por defecto se deduce de la extensión")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    input_format = args.format
+    if input_format is None:
+        input_format = "ndjson" if args.file.endswith((".ndjson", ".jsonl")) else "csv"
+    batch_size = max(1, min(args.batch_size, IMPORT_MAX_BATCH_SIZE))
+
+    report = asyncio.run(run(args.file, input_format, batch_size))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
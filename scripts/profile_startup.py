@@ -0,0 +1,94 @@
+import os
+import sys
+import json
+import asyncio
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_PACKAGES = ("main", "utils", "controllers", "models")
+
+
+def import_profile() -> list:
+    # -X importtime escribe en stderr: "import time: self [us] | cumulative | paquete".
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    entries = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    if completed.returncode != 0:
+        raise SystemExit(f"'import main' falló:\n{completed.stderr[-2000:]}")
+    return entries
+
+
+def summarize_imports(entries: list, top: int) -> dict:
+    by_package = {}
+    for name, self_us, _, _ in entries:
+        package = name.split(".")[0]
+        by_package[package] = by_package.get(package, 0) + self_us
+    project = [
+        (name, cumulative_us)
+        for name, _, cumulative_us, _ in entries
+        if name.split(".")[0] in PROJECT_PACKAGES
+    ]
+    total_us = next((cumulative_us for name, _, cumulative_us, _ in entries if name == "main"), 0)
+    return {
+        "total_ms": round(total_us / 1000, 1),
+        "packages_ms": {
+            package: round(self_us / 1000, 1)
+            for package, self_us in sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]
+        },
+        "project_modules_ms": {
+            name: round(cumulative_us / 1000, 1)
+            for name, cumulative_us in sorted(project, key=lambda item: item[1], reverse=True)
+        },
+    }
+
+
+async def init_profile() -> dict:
+    # Ejecuta el lifespan real con la configuración del .env: mide cada cliente externo.
+    sys.path.insert(0, ROOT)
+    import main
+
+    async with main.app.router.lifespan_context(main.app):
+        pass
+    return dict(main.startup_timings)
+
+
+def print_table(title: str, values: dict) -> None:
+    print(f"\n{title}")
+    for name, milliseconds in values.items():
+        print(f"  {name:<45} {milliseconds:>9.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perfil del arranque de la API: importación por módulo e inicialización de clientes.")
+    parser.add_argument("--top", type=int, default=15, help="paquetes de terceros a listar")
+    parser.add_argument("--skip-init", action="store_true", help="solo mide la importación (sin BD, Redis ni Firebase)")
+    parser.add_argument("--json", action="store_true", help="imprime los resultados como JSON")
+    args = parser.parse_args()
+
+    report = summarize_imports(import_profile(), args.top)
+    if not args.skip_init:
+        report["init_ms"] = asyncio.run(init_profile())
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"Importación de main: {report['total_ms']:.1f} ms")
+    print_table("Paquetes (tiempo propio de importación)", report["packages_ms"])
+    print_table("Módulos de la API (acumulado)", report["project_modules_ms"])
+    if "init_ms" in report:
+        print_table("Inicialización (lifespan)", report["init_ms"])
+
+
+if __name__ == "__main__":
+    main()
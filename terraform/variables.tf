@@ -40,3 +40,9 @@ variable "admin_sql_password" {
   type        = string
   description = "admin password"
 }
+
+variable "trusted_proxy_ips" {
+  type        = string
+  description = "IPs or CIDR networks of the App Service front end that forwards requests to the API container"
+  default     = "169.254.0.0/16"
+}
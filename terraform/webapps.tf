@@ -38,5 +38,7 @@ resource "azurerm_linux_web_app" "webappapi" {
     }
     app_settings = {
         WEBSITES_PORT = "80"
+        # Solo el front-end de App Service puede fijar X-Forwarded-For; ver TRUSTED_PROXY_IPS en utils/server.py.
+        TRUSTED_PROXY_IPS = var.trusted_proxy_ips
     }
 }
\ No newline at end of file
@@ -0,0 +1,118 @@
+import asyncio
+import contextvars
+from contextlib import asynccontextmanager
+from fastapi import HTTPException
+from typing import Optional
+
+from utils.metrics import Counter, register_collector
+
+LOAD_SHED = Counter(
+    "movies_api_load_shed_total",
+    "Peticiones rechazadas por control de admisión (cola llena o tiempo de espera agotado).",
+)
+
+# Tiempo máximo de espera en cola fijado por la ruta en curso (ver utils/rate_limit.py).
+queue_timeout_override: contextvars.ContextVar = contextvars.ContextVar("queue_timeout_override", default=None)
+
+_gates: list = []
+
+
+class OverloadedError(HTTPException):
+    # Subclase de HTTPException: atraviesa los "except HTTPException: raise" de los controladores como 503.
+    def __init__(self, gate: str, retry_after: int):
+        super().__init__(
+            status_code=503,
+            detail="Servicio saturado, intente de nuevo en unos segundos.",
+            headers={"Retry-After": str(retry_after)},
+        )
+        self.gate = gate
+
+
+class AdmissionGate:
+    # Límite de concurrencia por worker con cola acotada: lo que no cabe o espera demasiado
+    # se rechaza de inmediato en lugar de acumularse frente al recurso.
+    def __init__(self, name: str, limit: int, max_queue: int, queue_timeout: float, retry_after: int = 1):
+        self.name = name
+        self.limit = max(1, limit)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop = None
+        self._in_flight = 0
+        self._waiting = 0
+        self._admitted = 0
+        self._rejected_queue_full = 0
+        self._rejected_timeout = 0
+        _gates.append(self)
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # El semáforo queda ligado al event loop; se recrea si cambia (p. ej. entre clientes de prueba).
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.limit)
+            self._loop = loop
+        return self._semaphore
+
+    def _reject(self, reason: str) -> OverloadedError:
+        LOAD_SHED.inc(gate=self.name, reason=reason)
+        return OverloadedError(self.name, self.retry_after)
+
+    @asynccontextmanager
+    async def slot(self):
+        semaphore = self._get_semaphore()
+        if semaphore.locked():
+            if self._waiting >= self.max_queue:
+                self._rejected_queue_full += 1
+                raise self._reject("queue_full")
+            timeout = queue_timeout_override.get()
+            if timeout is None:
+                timeout = self.queue_timeout
+            self._waiting += 1
+            try:
+                async with asyncio.timeout(timeout):
+                    await semaphore.acquire()
+            except TimeoutError:
+                self._rejected_timeout += 1
+                raise self._reject("timeout")
+            finally:
+                self._waiting -= 1
+        else:
+            await semaphore.acquire()
+
+        self._admitted += 1
+        self._in_flight += 1
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "limit": self.limit,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "admitted": self._admitted,
+            "rejected_queue_full": self._rejected_queue_full,
+            "rejected_timeout": self._rejected_timeout,
+        }
+
+
+def get_admission_stats() -> list:
+    return [gate.stats() for gate in _gates]
+
+
+def _gate_samples():
+    for gate in _gates:
+        labels = {"gate": gate.name}
+        yield "movies_api_admission_in_flight", "gauge", "Operaciones en curso por compuerta de admisión.", labels, gate._in_flight
+    for gate in _gates:
+        labels = {"gate": gate.name}
+        yield "movies_api_admission_waiting", "gauge", "Operaciones en cola por compuerta de admisión.", labels, gate._waiting
+
+
+register_collector(_gate_samples)
@@ -0,0 +1,161 @@
+import re
+from typing import Iterable, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_YEAR_RE = re.compile(r"\((\d{4})(?:\s*[-–]\s*\d{0,4})?\)\s*$")
+NO_GENRES = "(no genres listed)"
+
+
+def parse_year(title: Optional[str]) -> int:
+    match = _YEAR_RE.search(title or "")
+    return int(match.group(1)) if match else 0
+
+
+def parse_genres(genres: Optional[str]) -> List[str]:
+    names = dict.fromkeys(name.strip() for name in (genres or "").split("|"))
+    return [name for name in names if name and name != NO_GENRES]
+
+
+class CatalogStats:
+    # Conteo por género, películas por año y co-ocurrencia de géneros. Cada lote de filas se pasa
+    # a columnas y se agrega de una vez; como los agregados son sumas, un alta solo suma su aporte.
+    # La diagonal de la matriz de co-ocurrencia es el conteo por género.
+    def __init__(self, rescan_window: int = 0):
+        self.genres: List[str] = []
+        self._genre_index: dict = {}
+        self._co_occurrence = np.zeros((0, 0), dtype=np.int64) if np is not None else []
+        self._year_counts: dict = {}
+        # Ids ya sumados por encima de rescan_from(): al releer esa ventana no se cuentan dos veces.
+        self._counted: set = set()
+        self.rescan_window = max(0, rescan_window)
+        self.total = 0
+        self.without_year = 0
+        self.loaded_through = 0
+        self.max_movie_id = 0
+        self.version = 0
+        self.ready = False
+
+    def __len__(self) -> int:
+        return self.total
+
+    def _genre_id(self, name: str) -> int:
+        index = self._genre_index.get(name)
+        if index is None:
+            index = self._genre_index[name] = len(self.genres)
+            self.genres.append(name)
+        return index
+
+    def _grow(self) -> None:
+        size = len(self.genres)
+        current = len(self._co_occurrence)
+        if size <= current:
+            return
+        if np is not None:
+            grown = np.zeros((size, size), dtype=np.int64)
+            grown[:current, :current] = self._co_occurrence
+            self._co_occurrence = grown
+        else:
+            for row in self._co_occurrence:
+                row.extend([0] * (size - current))
+            self._co_occurrence.extend([0] * size for _ in range(size - current))
+
+    def _aggregate(self, rows: Sequence[tuple]) -> None:
+        # Muchas películas comparten la misma cadena de géneros: se parsea una vez por combinación.
+        combos: dict = {}
+        codes = [combos.setdefault(genres or "", len(combos)) for _, _, genres in rows]
+        combo_ids = [[self._genre_id(name) for name in parse_genres(genres)] for genres in combos]
+        years = [parse_year(title) for _, title, _ in rows]
+        self._grow()
+
+        if np is not None:
+            # Matriz combinación x género (0/1) ponderada por cuántas filas la usan: M^T·diag(n)·M da
+            # la co-ocurrencia y, en la diagonal, el conteo por género.
+            weights = np.bincount(np.asarray(codes, dtype=np.int64), minlength=len(combo_ids))
+            matrix = np.zeros((len(combo_ids), len(self.genres)), dtype=np.int64)
+            matrix[
+                [position for position, ids in enumerate(combo_ids) for _ in ids],
+                [genre_id for ids in combo_ids for genre_id in ids],
+            ] = 1
+            self._co_occurrence += (matrix.T * weights) @ matrix
+
+            years = np.asarray(years, dtype=np.int64)
+            known = years[years > 0]
+            if known.size:
+                first = int(known.min())
+                counts = np.bincount(known - first)
+                for offset in np.flatnonzero(counts):
+                    year = first + int(offset)
+                    self._year_counts[year] = self._year_counts.get(year, 0) + int(counts[offset])
+            known_count = int(known.size)
+        else:
+            for code in codes:
+                ids = combo_ids[code]
+                for a in ids:
+                    row = self._co_occurrence[a]
+                    for b in ids:
+                        row[b] += 1
+            known_count = 0
+            for year in years:
+                if year:
+                    self._year_counts[year] = self._year_counts.get(year, 0) + 1
+                    known_count += 1
+
+        self.total += len(rows)
+        self.without_year += len(rows) - known_count
+        self.max_movie_id = max(self.max_movie_id, max(row[0] for row in rows))
+        self.version += 1
+
+    def rescan_from(self) -> int:
+        # Un id de identidad se asigna al insertar pero la fila se ve al confirmar: las transacciones
+        # lentas aparecen por debajo de loaded_through. La puesta al día relee esta ventana.
+        return max(0, self.loaded_through - self.rescan_window)
+
+    def add_many(self, rows: Iterable[tuple]) -> int:
+        # Filas leídas de la fuente (BD o CSV); las ya sumadas (ventana releída o record()) se omiten.
+        rows = list(rows)
+        if not rows:
+            return 0
+        self.loaded_through = max(self.loaded_through, max(row[0] for row in rows))
+        fresh = [row for row in rows if row[0] not in self._counted] if self._counted else rows
+        if fresh:
+            self._aggregate(fresh)
+        floor = self.rescan_from()
+        self._counted = {movie_id for movie_id in self._counted if movie_id > floor}
+        self._counted.update(row[0] for row in fresh if row[0] > floor)
+        return len(fresh)
+
+    def record(self, movie_id: int, title: str, genres: Optional[str]) -> None:
+        # Alta hecha por este worker: se suma ya y se recuerda para no contarla dos veces al ponerse al día.
+        if movie_id <= self.rescan_from() or movie_id in self._counted:
+            return
+        self._counted.add(movie_id)
+        self._aggregate([(movie_id, title, genres)])
+
+    def to_dict(self) -> dict:
+        counts = self._co_occurrence
+        size = len(self.genres)
+        genres = sorted(
+            ({"genre": self.genres[i], "count": int(counts[i][i])} for i in range(size) if counts[i][i]),
+            key=lambda item: (-item["count"], item["genre"]),
+        )
+        pairs = sorted(
+            (
+                {"genres": sorted((self.genres[i], self.genres[j])), "count": int(counts[i][j])}
+                for i in range(size)
+                for j in range(i + 1, size)
+                if counts[i][j]
+            ),
+            key=lambda item: (-item["count"], item["genres"]),
+        )
+        return {
+            "total": self.total,
+            "without_year": self.without_year,
+            "max_movie_id": self.max_movie_id,
+            "genres": genres,
+            "years": [{"year": year, "count": self._year_counts[year]} for year in sorted(self._year_counts)],
+            "co_occurrence": pairs,
+        }
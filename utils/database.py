@@ -1,15 +1,22 @@
 import os
-import pyodbc
-import logging
+import time
 import json
-from dotenv import load_dotenv
+import asyncio
+import logging
+import threading
+import itertools
+import functools
+import contextvars
+import pyodbc
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional
 
-load_dotenv()
+from utils.serialization import rows_to_json
+from utils.metrics import Histogram, stage, register_collector
+from utils.admission import AdmissionGate
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 driver = os.getenv('SQL_DRIVER', 'ODBC Driver 18 for SQL Server')
@@ -18,77 +25,813 @@ database = os.getenv('SQLDATABASE')
 username = os.getenv('SQLUSER')
 password = os.getenv('SQLPASSWORD')
 
-connection_string = (
-    f"DRIVER={driver};"
-    f"SERVER={server};"
-    f"DATABASE={database};"
-    f"UID={username};"
-    f"PWD={password};"
-    "TrustServerCertificate=yes;"
+
+def build_connection_string(host: Optional[str], read_only: bool = False) -> str:
+    dsn = (
+        f"DRIVER={driver};"
+        f"SERVER={host};"
+        f"DATABASE={database};"
+        f"UID={username};"
+        f"PWD={password};"
+        "TrustServerCertificate=yes;"
+    )
+    # En un grupo de disponibilidad, el listener redirige las conexiones de solo lectura a un secundario.
+    return dsn + "ApplicationIntent=ReadOnly;" if read_only else dsn
+
+
+connection_string = build_connection_string(server)
+
+# Réplicas de lectura separadas por "|": un nombre de servidor (mismas credenciales que el primario)
+# o una cadena de conexión completa, p. ej. dos instancias locales en puertos distintos.
+SQL_READ_REPLICAS = [item.strip() for item in os.getenv("SQL_READ_REPLICAS", "").split("|") if item.strip()]
+SQL_REPLICA_MAX_FAILURES = int(os.getenv("SQL_REPLICA_MAX_FAILURES", "2"))
+SQL_REPLICA_EJECT_SECONDS = float(os.getenv("SQL_REPLICA_EJECT_SECONDS", "30"))
+# Tras invalidar un tag de caché, las lecturas que rellenan sus entradas van al primario durante este
+# tiempo (margen sobre el retraso de las réplicas).
+SQL_READ_YOUR_WRITES_WINDOW = float(os.getenv("SQL_READ_YOUR_WRITES_WINDOW", "10"))
+# Espera máxima por una conexión de réplica: si su pool está agotado se pasa al siguiente destino
+# en lugar de consumir el timeout completo de cada réplica antes de llegar al primario.
+SQL_REPLICA_ACQUIRE_TIMEOUT = float(os.getenv("SQL_REPLICA_ACQUIRE_TIMEOUT", "0.05"))
+SQL_REPLICA_CONNECT_TIMEOUT = int(os.getenv("SQL_REPLICA_CONNECT_TIMEOUT", "3"))
+
+SQL_POOL_MIN_SIZE = int(os.getenv("SQL_POOL_MIN_SIZE", "2"))
+SQL_POOL_MAX_SIZE = int(os.getenv("SQL_POOL_MAX_SIZE", "10"))
+SQL_POOL_ACQUIRE_TIMEOUT = float(os.getenv("SQL_POOL_ACQUIRE_TIMEOUT", "5"))
+SQL_POOL_IDLE_TIMEOUT = float(os.getenv("SQL_POOL_IDLE_TIMEOUT", "300"))
+SQL_POOL_MAX_LIFETIME = float(os.getenv("SQL_POOL_MAX_LIFETIME", "1800"))
+SQL_POOL_HEALTH_CHECK_INTERVAL = float(os.getenv("SQL_POOL_HEALTH_CHECK_INTERVAL", "30"))
+SQL_CONNECT_TIMEOUT = int(os.getenv("SQL_CONNECT_TIMEOUT", "10"))
+# Conexiones entre el primario y todas las réplicas: hilos y admisión se dimensionan para usarlas todas.
+SQL_TOTAL_CONNECTIONS = SQL_POOL_MAX_SIZE * (1 + len(SQL_READ_REPLICAS))
+SQL_STREAM_BATCH_SIZE = int(os.getenv("SQL_STREAM_BATCH_SIZE", "1000"))
+# Un streaming retiene su conexión mientras el cliente consume (p. ej. /catalog/export): tiene admisión
+# propia para no ocupar los slots del resto de consultas, y una duración máxima.
+SQL_STREAM_MAX_CONCURRENCY = int(os.getenv("SQL_STREAM_MAX_CONCURRENCY", "4"))
+SQL_STREAM_MAX_QUEUE = int(os.getenv("SQL_STREAM_MAX_QUEUE", "8"))
+SQL_STREAM_MAX_SECONDS = float(os.getenv("SQL_STREAM_MAX_SECONDS", "300"))
+SQL_EXECUTOR_WORKERS = int(
+    os.getenv("SQL_EXECUTOR_WORKERS", str(SQL_TOTAL_CONNECTIONS + SQL_STREAM_MAX_CONCURRENCY))
 )
+# Control de admisión: operaciones de BD simultáneas por worker y cola acotada delante del pool.
+SQL_MAX_CONCURRENCY = int(os.getenv("SQL_MAX_CONCURRENCY", str(SQL_TOTAL_CONNECTIONS)))
+SQL_MAX_QUEUE = int(os.getenv("SQL_MAX_QUEUE", "100"))
+SQL_QUEUE_TIMEOUT = float(os.getenv("SQL_QUEUE_TIMEOUT", "2"))
+SQL_DRAIN_TIMEOUT = float(os.getenv("SQL_DRAIN_TIMEOUT", "10"))
+
+# El pool propio reemplaza al pooling del driver manager de ODBC.
+pyodbc.pooling = False
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+class PoolClosedError(Exception):
+    pass
+
+
+class DatabaseConnectionError(Exception):
+    pass
+
+
+class StreamTimeoutError(Exception):
+    pass
+
+
+DB_QUERY_SECONDS = Histogram(
+    "movies_api_db_query_seconds",
+    "Duración de las consultas SQL por destino (primario o réplica), sin la espera por conexión.",
+)
+
+
+class _PooledConnection:
+    __slots__ = ("conn", "created_at", "last_used", "last_checked")
+
+    def __init__(self, conn, now: float):
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+        self.last_checked = now
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        dsn: str,
+        name: str = "primary",
+        min_size: int = SQL_POOL_MIN_SIZE,
+        max_size: int = SQL_POOL_MAX_SIZE,
+        acquire_timeout: float = SQL_POOL_ACQUIRE_TIMEOUT,
+        idle_timeout: float = SQL_POOL_IDLE_TIMEOUT,
+        max_lifetime: float = SQL_POOL_MAX_LIFETIME,
+        health_check_interval: float = SQL_POOL_HEALTH_CHECK_INTERVAL,
+        connect_timeout: int = SQL_CONNECT_TIMEOUT,
+    ):
+        self.dsn = dsn
+        self.name = name
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max(1, max_size)
+        self.acquire_timeout = acquire_timeout
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_interval = health_check_interval
+        self.connect_timeout = connect_timeout
+
+        self._cond = threading.Condition()
+        self._idle: deque = deque()
+        self._size = 0
+        self._in_use = 0
+        self._waiters = 0
+        self._closed = False
+
+        self._acquire_count = 0
+        self._acquire_time_total = 0.0
+        self._acquire_time_max = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._discarded = 0
+        self._health_check_failures = 0
+        self._query_count = 0
+        self._query_time_total = 0.0
+        self._query_time_max = 0.0
+
+    def _connect(self) -> _PooledConnection:
+        try:
+            conn = pyodbc.connect(self.dsn, timeout=self.connect_timeout)
+        except pyodbc.Error as e:
+            logger.error(f"Error de conexión a la base de datos ({self.name}): {str(e)}")
+            raise DatabaseConnectionError(f"Error de conexión a la base de datos: {str(e)}") from e
+        with self._cond:
+            self._created += 1
+        logger.info("Nueva conexión abierta en el pool '%s'.", self.name)
+        return _PooledConnection(conn, time.monotonic())
+
+    def _close_connection(self, pooled: _PooledConnection) -> None:
+        try:
+            pooled.conn.close()
+        except pyodbc.Error as e:
+            logger.warning("Error al cerrar conexión del pool '%s': %s", self.name, e)
+
+    def _is_usable(self, pooled: _PooledConnection) -> bool:
+        now = time.monotonic()
+        if now - pooled.created_at > self.max_lifetime:
+            return False
+        if now - pooled.last_used > self.idle_timeout:
+            return False
+        if now - pooled.last_checked > self.health_check_interval:
+            try:
+                cursor = pooled.conn.cursor()
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+                cursor.close()
+                pooled.last_checked = now
+            except pyodbc.Error as e:
+                logger.warning("Conexión no saludable en el pool '%s': %s", self.name, e)
+                with self._cond:
+                    self._health_check_failures += 1
+                return False
+        return True
+
+    def _discard(self, pooled: _PooledConnection) -> None:
+        self._close_connection(pooled)
+        with self._cond:
+            self._size -= 1
+            self._in_use -= 1
+            self._discarded += 1
+            self._cond.notify()
+
+    def fill(self) -> None:
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                pooled = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._idle.append(pooled)
+                self._cond.notify()
+
+    def acquire(self, deadline: Optional[float] = None) -> _PooledConnection:
+        start = time.monotonic()
+        if deadline is None:
+            deadline = start + self.acquire_timeout
+
+        while True:
+            pooled = None
+            with self._cond:
+                self._waiters += 1
+                try:
+                    while True:
+                        if self._closed:
+                            raise PoolClosedError(f"El pool '{self.name}' está cerrado.")
+                        if self._idle:
+                            # LIFO: reutiliza la conexión más reciente y deja envejecer al resto.
+                            pooled = self._idle.pop()
+                            break
+                        if self._size < self.max_size:
+                            self._size += 1
+                            break
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._timeouts += 1
+                            raise PoolTimeoutError(
+                                f"Tiempo de espera agotado al obtener conexión del pool '{self.name}'."
+                            )
+                        self._cond.wait(remaining)
+                finally:
+                    self._waiters -= 1
+                self._in_use += 1
+
+            if pooled is None:
+                try:
+                    pooled = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._in_use -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._is_usable(pooled):
+                self._discard(pooled)
+                continue
+
+            elapsed = time.monotonic() - start
+            with self._cond:
+                self._acquire_count += 1
+                self._acquire_time_total += elapsed
+                if elapsed > self._acquire_time_max:
+                    self._acquire_time_max = elapsed
+            return pooled
+
+    def release(self, pooled: _PooledConnection, discard: bool = False) -> None:
+        if discard or self._closed:
+            self._discard(pooled)
+            return
+
+        now = time.monotonic()
+        pooled.last_used = now
+        expired = []
+        with self._cond:
+            self._in_use -= 1
+            self._idle.append(pooled)
+            # Recicla las conexiones ociosas más antiguas por encima del mínimo.
+            while (
+                self._idle
+                and self._size > self.min_size
+                and now - self._idle[0].last_used > self.idle_timeout
+            ):
+                expired.append(self._idle.popleft())
+                self._size -= 1
+                self._discarded += 1
+            self._cond.notify()
+
+        for old in expired:
+            self._close_connection(old)
+
+    def record_query(self, elapsed: float) -> None:
+        DB_QUERY_SECONDS.observe(elapsed, target=self.name)
+        with self._cond:
+            self._query_count += 1
+            self._query_time_total += elapsed
+            if elapsed > self._query_time_max:
+                self._query_time_max = elapsed
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for pooled in idle:
+            self._close_connection(pooled)
+        logger.info(f"Pool '{self.name}' cerrado ({len(idle)} conexiones liberadas).")
+
+    def stats(self) -> dict:
+        with self._cond:
+            count = self._acquire_count
+            return {
+                "name": self.name,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "waiters": self._waiters,
+                "acquire_count": count,
+                "acquire_avg_ms": round(self._acquire_time_total / count * 1000, 3) if count else 0.0,
+                "acquire_max_ms": round(self._acquire_time_max * 1000, 3),
+                "acquire_timeouts": self._timeouts,
+                "connections_created": self._created,
+                "connections_discarded": self._discarded,
+                "health_check_failures": self._health_check_failures,
+                "query_count": self._query_count,
+                "query_avg_ms": round(self._query_time_total / self._query_count * 1000, 3) if self._query_count else 0.0,
+                "query_max_ms": round(self._query_time_max * 1000, 3),
+            }
+
+
+class ReplicaRouter:
+    # Round-robin entre las réplicas sanas. Tras SQL_REPLICA_MAX_FAILURES fallos de conectividad seguidos,
+    # una réplica queda fuera SQL_REPLICA_EJECT_SECONDS; pasado ese tiempo vuelve a recibir tráfico y,
+    # si falla otra vez, se expulsa de nuevo.
+    def __init__(self, pools: list, max_failures: int, eject_seconds: float):
+        self.pools = pools
+        self.max_failures = max(1, max_failures)
+        self.eject_seconds = eject_seconds
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._failures = {pool.name: 0 for pool in pools}
+        self._ejected_until = {pool.name: 0.0 for pool in pools}
+        self._ejections = {pool.name: 0 for pool in pools}
+        self._failovers = 0
+
+    def candidates(self) -> list:
+        now = time.monotonic()
+        healthy = [pool for pool in self.pools if self._ejected_until[pool.name] <= now]
+        if not healthy:
+            return []
+        start = next(self._counter) % len(healthy)
+        return healthy[start:] + healthy[:start]
+
+    def mark_success(self, pool: ConnectionPool) -> None:
+        if self._failures[pool.name]:
+            with self._lock:
+                self._failures[pool.name] = 0
+
+    def mark_failure(self, pool: ConnectionPool, error: Exception) -> None:
+        with self._lock:
+            self._failures[pool.name] += 1
+            if self._failures[pool.name] < self.max_failures:
+                return
+            self._failures[pool.name] = 0
+            self._ejected_until[pool.name] = time.monotonic() + self.eject_seconds
+            self._ejections[pool.name] += 1
+        logger.warning("⚠️ Réplica '%s' fuera de rotación por %.0fs: %s", pool.name, self.eject_seconds, error)
+
+    def mark_failover(self) -> None:
+        with self._lock:
+            self._failovers += 1
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "replicas": [
+                    {
+                        **pool.stats(),
+                        "healthy": self._ejected_until[pool.name] <= now,
+                        "consecutive_failures": self._failures[pool.name],
+                        "ejections": self._ejections[pool.name],
+                    }
+                    for pool in self.pools
+                ],
+                "failovers": self._failovers,
+            }
+
+
+_pool: Optional[ConnectionPool] = None
+_router: Optional[ReplicaRouter] = None
+_executor: Optional[ThreadPoolExecutor] = None
+db_gate = AdmissionGate("database", SQL_MAX_CONCURRENCY, SQL_MAX_QUEUE, SQL_QUEUE_TIMEOUT)
+db_stream_gate = AdmissionGate("database_stream", SQL_STREAM_MAX_CONCURRENCY, SQL_STREAM_MAX_QUEUE, SQL_QUEUE_TIMEOUT)
+_init_lock = threading.Lock()
+# Lecturas de esta petición forzadas al primario (se activa al escribir: read-your-writes).
+_primary_reads: contextvars.ContextVar = contextvars.ContextVar("primary_reads", default=False)
+# Tag de caché -> instante (monotonic) hasta el que las lecturas que lo rellenan van al primario.
+_pinned_tags: dict = {}
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _init_lock:
+            if _pool is None:
+                _pool = ConnectionPool(connection_string)
+    return _pool
+
+
+def get_router() -> Optional[ReplicaRouter]:
+    global _router
+    if _router is None and SQL_READ_REPLICAS:
+        with _init_lock:
+            if _router is None:
+                pools = [
+                    ConnectionPool(
+                        replica if "=" in replica else build_connection_string(replica, read_only=True),
+                        name=f"replica{position}",
+                        acquire_timeout=SQL_REPLICA_ACQUIRE_TIMEOUT,
+                        connect_timeout=SQL_REPLICA_CONNECT_TIMEOUT,
+                    )
+                    for position, replica in enumerate(SQL_READ_REPLICAS, start=1)
+                ]
+                _router = ReplicaRouter(pools, SQL_REPLICA_MAX_FAILURES, SQL_REPLICA_EJECT_SECONDS)
+    return _router
+
+
+def pin_reads_to_primary(tags: Iterable[str], seconds: float = SQL_READ_YOUR_WRITES_WINDOW) -> None:
+    # Tags invalidados por una escritura (de este worker o avisada por el canal de invalidaciones):
+    # durante la ventana, las entradas que dependen de ellos no se rellenan desde una réplica atrasada.
+    # El resto de las lecturas sigue yendo a las réplicas.
+    if not SQL_READ_REPLICAS:
+        return
+    now = time.monotonic()
+    until = now + seconds
+    for tag in tags:
+        _pinned_tags[tag] = max(_pinned_tags.get(tag, 0.0), until)
+    for tag in [tag for tag, pinned_until in _pinned_tags.items() if pinned_until <= now]:
+        del _pinned_tags[tag]
+
+
+def reads_pinned(tags: Iterable[str]) -> bool:
+    if not _pinned_tags:
+        return False
+    now = time.monotonic()
+    return any(_pinned_tags.get(tag, 0.0) > now for tag in tags)
+
+
+def _note_write() -> None:
+    # El resto de la petición en curso lee del primario: ve su propia escritura.
+    _primary_reads.set(True)
+
+
+def _is_read_only(sql: str) -> bool:
+    statement = sql.lstrip()[:6].upper()
+    return statement == "SELECT" or statement.startswith("WITH")
+
+
+def _read_targets(sql: str, needs_commit: bool, consistent: bool) -> list:
+    # Réplicas sanas en orden round-robin y el primario siempre al final como respaldo.
+    primary = get_pool()
+    if needs_commit or consistent or not SQL_READ_REPLICAS or not _is_read_only(sql):
+        return [primary]
+    if _primary_reads.get():
+        return [primary]
+    return get_router().candidates() + [primary]
+
+
+def _is_connectivity_error(error: Exception) -> bool:
+    if isinstance(error, (DatabaseConnectionError, PoolClosedError)):
+        return True
+    return isinstance(error.__cause__, pyodbc.OperationalError)
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _init_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=SQL_EXECUTOR_WORKERS,
+                    thread_name_prefix="sql",
+                )
+    return _executor
+
+
+async def run_in_db_executor(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    # Se copia el contexto para que los spans creados en el hilo cuelguen del span de la petición.
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_executor(), functools.partial(context.run, func, *args, **kwargs))
+
+
+async def init_db_pool() -> None:
+    pool = get_pool()
+    router = get_router()
+
+    async def fill_replica(replica: ConnectionPool) -> None:
+        try:
+            await run_in_db_executor(replica.fill)
+            logger.info("Pool de réplica inicializado: %s", replica.stats())
+        except Exception as e:
+            logger.error(f"No se pudo precalentar la réplica '{replica.name}': {e}")
+            router.mark_failure(replica, e)
 
-async def get_db_connection():
     try:
-        logger.info("Intentando conectar a la base de datos...")
-        conn = pyodbc.connect(connection_string, timeout=10)
-        logger.info("Conexión establecida exitosamente.")
-        return conn
-    except pyodbc.Error as e:
-        logger.error(f"Error de conexión a la base de datos: {str(e)}")
-        raise Exception(f"Error de conexión a la base de datos: {str(e)}")
+        await run_in_db_executor(pool.fill)
+        logger.info("Pool de base de datos inicializado: %s", pool.stats())
     except Exception as e:
-        logger.error(f"Error inesperado al conectar: {str(e)}")
-        raise
+        logger.error(f"No se pudo precalentar el pool de base de datos: {e}")
+    if router is not None:
+        await asyncio.gather(*(fill_replica(replica) for replica in router.pools))
+
+
+async def close_db_pool() -> None:
+    # Primero terminan las consultas que siguen en los hilos (p. ej. de peticiones canceladas) y luego
+    # se cierran las conexiones; la espera ocurre fuera del event loop y con tope SQL_DRAIN_TIMEOUT.
+    global _pool, _router, _executor
+    if _executor is not None:
+        executor, _executor = _executor, None
+        try:
+            await asyncio.wait_for(asyncio.to_thread(executor.shutdown, wait=True), SQL_DRAIN_TIMEOUT)
+        except TimeoutError:
+            logger.warning(f"⚠️ Consultas SQL aún en curso tras {SQL_DRAIN_TIMEOUT}s; se cierra el pool igualmente.")
+            executor.shutdown(wait=False, cancel_futures=True)
+    if _pool is not None:
+        _pool.close()
+        _pool = None
+    if _router is not None:
+        for replica in _router.pools:
+            replica.close()
+        _router = None
+
+
+def get_pool_stats() -> dict:
+    stats = {**get_pool().stats(), "admission": db_gate.stats(), "stream_admission": db_stream_gate.stats()}
+    router = get_router()
+    if router is not None:
+        stats.update(router.stats())
+    return stats
+
+
+def _pool_samples():
+    if _pool is None:
+        return
+    all_stats = [pool.stats() for pool in (_pool, *(_router.pools if _router is not None else ()))]
+    for field in ("size", "idle", "in_use", "waiters"):
+        for stats in all_stats:
+            labels = {"pool": stats["name"]}
+            yield f"movies_api_db_pool_{field}", "gauge", f"Conexiones del pool SQL ({field}).", labels, stats[field]
+    for stats in all_stats:
+        labels = {"pool": stats["name"]}
+        yield "movies_api_db_pool_acquire_timeouts_total", "counter", "Timeouts al obtener conexión del pool SQL.", labels, stats["acquire_timeouts"]
+    if _router is not None:
+        healthy = {replica["name"]: replica["healthy"] for replica in _router.stats()["replicas"]}
+        for name, is_healthy in healthy.items():
+            yield "movies_api_db_replica_healthy", "gauge", "Réplica de lectura en rotación (1) o expulsada (0).", {"pool": name}, int(is_healthy)
+
+
+register_collector(_pool_samples)
+
+
+class QueryResult:
+    __slots__ = ("columns", "rows")
+
+    def __init__(self, columns: tuple, rows: list):
+        self.columns = columns
+        self.rows = rows
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def first(self) -> Optional[dict]:
+        if not self.rows:
+            return None
+        return dict(zip(self.columns, self.rows[0]))
+
+    def scalar(self):
+        if not self.rows:
+            return None
+        return self.rows[0][0]
 
-async def execute_query_json(sql: str, params: tuple = None, needs_commit: bool = False):
-    conn = None
+    def as_dicts(self) -> list:
+        columns = self.columns
+        return [dict(zip(columns, row)) for row in self.rows]
+
+    def to_json(self) -> bytes:
+        return rows_to_json(self.columns, self.rows)
+
+
+def _normalize_row(row) -> tuple:
+    return tuple(
+        str(item) if isinstance(item, (bytes, bytearray)) else item for item in row
+    )
+
+
+@contextmanager
+def _pooled_cursor(pool: ConnectionPool, deadline: float):
+    with stage("db.acquire", pool=pool.name):
+        pooled = pool.acquire(deadline)
+    conn = pooled.conn
     cursor = None
+    broken = False
     try:
-        conn = await get_db_connection()
         cursor = conn.cursor()
+        yield conn, cursor
 
+    except pyodbc.Error as e:
+        logger.error(f"Error SQL (SQLSTATE {e.args[0]}): {str(e)}")
+        try:
+            logger.warning("Intentando rollback por error...")
+            conn.rollback()
+        except pyodbc.Error as rb_e:
+            logger.error(f"Error durante rollback: {rb_e}")
+            broken = True
+        raise Exception(f"Error SQL: {str(e)}") from e
+
+    except Exception as e:
+        logger.error(f"Error inesperado en la consulta: {str(e)}")
+        broken = True
+        raise
+
+    finally:
+        if cursor:
+            try:
+                cursor.close()
+            except pyodbc.Error:
+                broken = True
+        pool.release(pooled, discard=broken)
+
+
+def _execute_query_sync(pool: ConnectionPool, sql: str, params: tuple, needs_commit: bool, deadline: float) -> QueryResult:
+    with _pooled_cursor(pool, deadline) as (conn, cursor), stage("db.query", pool=pool.name):
+        started = time.perf_counter()
         if params:
-            logger.info(f"Ejecutando SQL con parámetros: {sql}")
+            logger.debug("Ejecutando SQL con parámetros: %s", sql)
             cursor.execute(sql, params)
         else:
-            logger.info(f"Ejecutando SQL sin parámetros: {sql}")
+            logger.debug("Ejecutando SQL sin parámetros: %s", sql)
             cursor.execute(sql)
 
-        results = []
+        columns = ()
+        rows = []
         if cursor.description:
-            columns = [column[0] for column in cursor.description]
-            logger.info(f"Columnas devueltas: {columns}")
-            for row in cursor.fetchall():
-                processed_row = [
-                    str(item) if isinstance(item, (bytes, bytearray)) else item for item in row
-                ]
-                results.append(dict(zip(columns, processed_row)))
+            columns = tuple(column[0] for column in cursor.description)
+            logger.debug("Columnas devueltas: %s", columns)
+            rows = [_normalize_row(row) for row in cursor.fetchall()]
         else:
-            logger.info("Consulta ejecutada sin columnas devueltas (INSERT/UPDATE/DELETE).")
+            logger.debug("Consulta ejecutada sin columnas devueltas (INSERT/UPDATE/DELETE).")
 
         if needs_commit:
-            logger.info("Realizando commit...")
+            logger.debug("Realizando commit...")
             conn.commit()
+        else:
+            conn.rollback()
 
-        return json.dumps(results, default=str)
+        pool.record_query(time.perf_counter() - started)
+        return QueryResult(columns, rows)
 
-    except pyodbc.Error as e:
-        logger.error(f"Error SQL (SQLSTATE {e.args[0]}): {str(e)}")
-        if conn and needs_commit:
+
+def _execute_many_sync(sql: str, rows: list, deadline: float) -> int:
+    with _pooled_cursor(get_pool(), deadline) as (conn, cursor):
+        # fast_executemany envía todo el lote como arreglo de parámetros en una sola ida y vuelta.
+        cursor.fast_executemany = True
+        logger.debug("Ejecutando SQL por lotes (%d filas): %s", len(rows), sql)
+        with stage("db.execute_many"):
+            cursor.executemany(sql, rows)
+            conn.commit()
+        return len(rows)
+
+
+def _can_fail_over(error: Exception) -> bool:
+    # Solo errores de conectividad o de pool agotado: un error de la consulta se repetiría en el primario.
+    return isinstance(error, PoolTimeoutError) or _is_connectivity_error(error)
+
+
+def _target_failed(pool: ConnectionPool, error: Exception) -> None:
+    if _is_connectivity_error(error):
+        _router.mark_failure(pool, error)
+    _router.mark_failover()
+    logger.debug("Lectura reintentada fuera de '%s': %s", pool.name, error)
+
+
+async def execute_query(
+    sql: str,
+    params: tuple = None,
+    needs_commit: bool = False,
+    consistent: bool = False,
+) -> QueryResult:
+    # Las lecturas (SELECT sin commit) van a las réplicas salvo consistent=True o tras una escritura;
+    # todo lo demás, al primario.
+    async with db_gate.slot():
+        if needs_commit:
+            _note_write()
+        *replicas, primary = _read_targets(sql, needs_commit, consistent)
+        for pool in replicas:
+            # El plazo se fija al encolar para que la espera en el executor cuente dentro del timeout.
+            deadline = time.monotonic() + pool.acquire_timeout
             try:
-                logger.warning("Intentando rollback por error...")
-                conn.rollback()
-            except pyodbc.Error as rb_e:
-                logger.error(f"Error durante rollback: {rb_e}")
-        raise Exception(f"Error SQL: {str(e)}") from e
+                result = await run_in_db_executor(_execute_query_sync, pool, sql, params, needs_commit, deadline)
+            except Exception as e:
+                if not _can_fail_over(e):
+                    raise
+                _target_failed(pool, e)
+                continue
+            _router.mark_success(pool)
+            return result
+        deadline = time.monotonic() + primary.acquire_timeout
+        return await run_in_db_executor(_execute_query_sync, primary, sql, params, needs_commit, deadline)
 
-    except Exception as e:
-        logger.error(f"Error inesperado en la consulta: {str(e)}")
-        raise
 
-    finally:
-        if cursor:
+async def execute_many(sql: str, rows: list) -> int:
+    if not rows:
+        return 0
+    async with db_gate.slot():
+        _note_write()
+        deadline = time.monotonic() + get_pool().acquire_timeout
+        return await run_in_db_executor(_execute_many_sync, sql, rows, deadline)
+
+
+async def execute_query_json(sql: str, params: tuple = None, needs_commit: bool = False, consistent: bool = False):
+    result = await execute_query(sql, params, needs_commit, consistent)
+    return json.dumps(result.as_dicts(), default=str)
+
+
+def _open_stream_cursor(conn, sql: str, params: tuple):
+    cursor = conn.cursor()
+    if params:
+        cursor.execute(sql, params)
+    else:
+        cursor.execute(sql)
+    return cursor
+
+
+def _close_stream(pool: ConnectionPool, pooled: _PooledConnection, cursor, broken: bool) -> None:
+    try:
+        if cursor is not None:
             cursor.close()
-        if conn:
-            conn.close()
-            logger.info("Conexión cerrada.")
\ No newline at end of file
+        pooled.conn.rollback()
+    except pyodbc.Error as e:
+        logger.warning(f"Error al cerrar cursor de streaming: {e}")
+        broken = True
+    pool.release(pooled, discard=broken)
+
+
+def _serialized(lock: threading.Lock, func, *args):
+    with lock:
+        return func(*args)
+
+
+def _release_orphan(pool: ConnectionPool, future: asyncio.Future) -> None:
+    if future.cancelled() or future.exception() is not None:
+        return
+    pool.release(future.result())
+
+
+async def _acquire_connection(pool: ConnectionPool, deadline: float) -> _PooledConnection:
+    # Si quien espera se cancela mientras el hilo aún obtiene la conexión, esta se devuelve al pool
+    # cuando llegue en lugar de quedar tomada para siempre.
+    future = asyncio.ensure_future(run_in_db_executor(pool.acquire, deadline))
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        future.add_done_callback(functools.partial(_release_orphan, pool))
+        raise
+
+
+async def _acquire_for_read(targets: list):
+    # Solo se cambia de destino antes de ejecutar nada: una vez abierto el cursor, el recorrido sigue ahí.
+    *replicas, primary = targets
+    for pool in replicas:
+        try:
+            pooled = await _acquire_connection(pool, time.monotonic() + pool.acquire_timeout)
+        except Exception as e:
+            if not _can_fail_over(e):
+                raise
+            _target_failed(pool, e)
+            continue
+        _router.mark_success(pool)
+        return pool, pooled
+    return primary, await _acquire_connection(primary, time.monotonic() + primary.acquire_timeout)
+
+
+async def stream_query(
+    sql: str,
+    params: tuple = None,
+    batch_size: int = SQL_STREAM_BATCH_SIZE,
+    consistent: bool = False,
+):
+    # Mantiene una conexión del pool durante todo el recorrido y trae las filas por lotes con fetchmany.
+    # El lock evita que el cierre se ejecute en otro hilo mientras sigue en curso un fetchmany cancelado.
+    async with db_stream_gate.slot():
+        pool, pooled = await _acquire_for_read(_read_targets(sql, False, consistent))
+        lock = threading.Lock()
+        cursor = None
+        broken = False
+        # El plazo se comprueba entre lotes: un cliente lento no retiene la conexión indefinidamente.
+        expires_at = time.monotonic() + SQL_STREAM_MAX_SECONDS
+        try:
+            logger.debug("Ejecutando SQL en modo streaming: %s", sql)
+            cursor = await run_in_db_executor(_serialized, lock, _open_stream_cursor, pooled.conn, sql, params)
+            columns = tuple(column[0] for column in cursor.description) if cursor.description else ()
+            while columns:
+                if time.monotonic() > expires_at:
+                    raise StreamTimeoutError(
+                        f"Streaming interrumpido: superó la duración máxima de {SQL_STREAM_MAX_SECONDS:g}s."
+                    )
+                batch = await run_in_db_executor(_serialized, lock, cursor.fetchmany, batch_size)
+                if not batch:
+                    break
+                yield columns, [_normalize_row(row) for row in batch]
+        except StreamTimeoutError as e:
+            logger.warning("⚠️ %s", e)
+            raise
+        except pyodbc.Error as e:
+            logger.error(f"Error SQL en streaming (SQLSTATE {e.args[0]}): {str(e)}")
+            broken = True
+            raise Exception(f"Error SQL: {str(e)}") from e
+        except Exception as e:
+            logger.error(f"Error inesperado en streaming: {str(e)}")
+            broken = True
+            raise
+        finally:
+            await run_in_db_executor(_serialized, lock, _close_stream, pool, pooled, cursor, broken)
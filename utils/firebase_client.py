@@ -0,0 +1,177 @@
+import os
+import asyncio
+import logging
+import functools
+import threading
+import httpx
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from utils.metrics import stage
+from utils.admission import AdmissionGate
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIREBASE_API_KEY = os.getenv("FIREBASE_API_KEY")
+FIREBASE_CRED_PATH = os.getenv("FIREBASE_CRED_PATH")
+FIREBASE_AUTH_EMULATOR_HOST = os.getenv("FIREBASE_AUTH_EMULATOR_HOST")
+FIREBASE_HTTP_TIMEOUT = float(os.getenv("FIREBASE_HTTP_TIMEOUT", "10"))
+FIREBASE_HTTP_CONNECT_TIMEOUT = float(os.getenv("FIREBASE_HTTP_CONNECT_TIMEOUT", "3"))
+FIREBASE_HTTP_MAX_CONNECTIONS = int(os.getenv("FIREBASE_HTTP_MAX_CONNECTIONS", "50"))
+FIREBASE_HTTP_KEEPALIVE = int(os.getenv("FIREBASE_HTTP_KEEPALIVE", "20"))
+FIREBASE_MAX_CONCURRENCY = int(os.getenv("FIREBASE_MAX_CONCURRENCY", "50"))
+FIREBASE_MAX_QUEUE = int(os.getenv("FIREBASE_MAX_QUEUE", "200"))
+FIREBASE_QUEUE_TIMEOUT = float(os.getenv("FIREBASE_QUEUE_TIMEOUT", "5"))
+FIREBASE_ADMIN_WORKERS = int(os.getenv("FIREBASE_ADMIN_WORKERS", "8"))
+
+if FIREBASE_AUTH_EMULATOR_HOST:
+    # Mismo esquema de URL que el emulador de Firebase Auth; el Admin SDK lee la misma variable.
+    _DEFAULT_AUTH_URL = f"http://{FIREBASE_AUTH_EMULATOR_HOST}/identitytoolkit.googleapis.com/v1"
+else:
+    _DEFAULT_AUTH_URL = "https://identitytoolkit.googleapis.com/v1"
+FIREBASE_AUTH_URL = os.getenv("FIREBASE_AUTH_URL", _DEFAULT_AUTH_URL).rstrip("/")
+
+_client: Optional[httpx.AsyncClient] = None
+_transport: Optional[httpx.AsyncBaseTransport] = None
+firebase_gate = AdmissionGate("firebase", FIREBASE_MAX_CONCURRENCY, FIREBASE_MAX_QUEUE, FIREBASE_QUEUE_TIMEOUT)
+_admin_executor: Optional[ThreadPoolExecutor] = None
+_admin_lock = threading.Lock()
+_admin_ready = False
+
+
+class FirebaseAdminUnavailable(RuntimeError):
+    pass
+
+
+def set_transport(transport: Optional[httpx.AsyncBaseTransport]) -> None:
+    # Permite sustituir la red por un servidor de identidad local (p. ej. httpx.MockTransport)
+    # en pruebas y pruebas de carga; debe llamarse antes de init_firebase_client.
+    global _transport
+    _transport = transport
+
+
+def _build_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=FIREBASE_AUTH_URL,
+        transport=_transport,
+        timeout=httpx.Timeout(FIREBASE_HTTP_TIMEOUT, connect=FIREBASE_HTTP_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=FIREBASE_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=FIREBASE_HTTP_KEEPALIVE,
+        ),
+    )
+
+
+async def init_firebase_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = _build_client()
+        logger.info(f"Cliente HTTP de Firebase listo ({FIREBASE_AUTH_URL})")
+    return _client
+
+
+async def close_firebase_client() -> None:
+    global _client, _admin_executor
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        logger.info("Cliente HTTP de Firebase cerrado.")
+    if _admin_executor is not None:
+        _admin_executor.shutdown(wait=False, cancel_futures=True)
+        _admin_executor = None
+
+
+def _get_admin_executor() -> ThreadPoolExecutor:
+    global _admin_executor
+    if _admin_executor is None:
+        _admin_executor = ThreadPoolExecutor(
+            max_workers=FIREBASE_ADMIN_WORKERS,
+            thread_name_prefix="firebase",
+        )
+    return _admin_executor
+
+
+def _initialize_admin() -> None:
+    # firebase_admin (y google.auth) tarda en importarse: se carga en un hilo del pool del Admin SDK,
+    # nunca al importar la API ni en el event loop.
+    global _admin_ready
+    if _admin_ready:
+        return
+    with _admin_lock:
+        if _admin_ready:
+            return
+        try:
+            import firebase_admin
+            from firebase_admin import credentials
+
+            if not firebase_admin._apps:
+                if not FIREBASE_CRED_PATH:
+                    raise FileNotFoundError("La variable de entorno FIREBASE_CRED_PATH no está definida.")
+                full_cred_path = os.path.normpath(os.path.join(BASE_DIR, FIREBASE_CRED_PATH))
+                if not os.path.isfile(full_cred_path):
+                    raise FileNotFoundError(f"No se encontró archivo de credenciales Firebase: {full_cred_path}")
+                firebase_admin.initialize_app(credentials.Certificate(full_cred_path))
+                logger.info("Firebase inicializado correctamente.")
+        except Exception as e:
+            logger.error(f"Error al inicializar Firebase: {e}")
+            raise FirebaseAdminUnavailable("No se pudo inicializar Firebase") from e
+        _admin_ready = True
+
+
+def _call_admin(name: str, *args, **kwargs):
+    _initialize_admin()
+    from firebase_admin import auth
+
+    return getattr(auth, name)(*args, **kwargs)
+
+
+async def init_firebase_admin() -> bool:
+    # Se llama desde el lifespan, en paralelo con la BD y Redis; un fallo no impide arrancar,
+    # se reintenta en la siguiente llamada a run_admin.
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(_get_admin_executor(), _initialize_admin)
+        return True
+    except FirebaseAdminUnavailable:
+        return False
+
+
+async def run_admin(name: str, *args, **kwargs):
+    # El Admin SDK es bloqueante: corre en su propio pool para no competir con los hilos de SQL.
+    # name es una función de firebase_admin.auth (p. ej. "create_user").
+    async with firebase_gate.slot():
+        return await _run_in_admin_executor(name, *args, **kwargs)
+
+
+async def run_admin_unthrottled(name: str, *args, **kwargs):
+    # Sin control de admisión: para compensaciones (deshacer un alta a medias) que no pueden
+    # descartarse por saturación sin dejar un usuario huérfano en Firebase.
+    return await _run_in_admin_executor(name, *args, **kwargs)
+
+
+async def _run_in_admin_executor(name: str, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    with stage(f"firebase.{name}"):
+        return await loop.run_in_executor(_get_admin_executor(), functools.partial(_call_admin, name, *args, **kwargs))
+
+
+async def sign_in_with_password(email: str, password: str) -> dict:
+    if not FIREBASE_API_KEY:
+        raise RuntimeError("API Key de Firebase no configurada")
+
+    client = await init_firebase_client()
+    payload = {
+        "email": email,
+        "password": password,
+        "returnSecureToken": True,
+    }
+    async with firebase_gate.slot():
+        with stage("firebase.sign_in"):
+            response = await client.post(
+                "/accounts:signInWithPassword",
+                params={"key": FIREBASE_API_KEY},
+                json=payload,
+            )
+    response.raise_for_status()
+    return response.json()
@@ -0,0 +1,99 @@
+import os
+import gzip
+import hashlib
+from typing import Iterable, Optional
+
+from fastapi.responses import Response
+
+from utils.serialization import RawJSONResponse
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+CACHE_CONTROL = "private, no-cache"
+
+
+class PreparedBody:
+    # Cuerpo ya serializado y comprimido una sola vez; se sirve tal cual en cada hit.
+    __slots__ = ("body", "gzip", "br", "etag", "meta")
+
+    def __init__(self, body: bytes, etag: str, meta: Optional[dict] = None):
+        self.body = body
+        self.etag = etag
+        self.meta = meta or {}
+        self.gzip = None
+        self.br = None
+        if len(body) >= COMPRESSION_MIN_SIZE:
+            self.gzip = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+            if brotli is not None:
+                self.br = brotli.compress(body, quality=BROTLI_QUALITY)
+
+
+def make_etag(key: str, versions: Iterable[int]) -> str:
+    digest = hashlib.blake2b(key.encode(), digest_size=6).hexdigest()
+    return f'"{digest}-{"-".join(str(version) for version in versions)}"'
+
+
+def content_etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        # If-None-Match usa comparación débil: W/"x" coincide con "x".
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def _accepted_encodings(accept_encoding: Optional[str]) -> set:
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        params = params.replace(" ", "")
+        if name and params not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(name.lower())
+    return accepted
+
+
+def not_modified(etag: str, headers: Optional[dict] = None) -> Response:
+    response = Response(status_code=304, headers=headers)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
+
+
+def prepared_response(
+    prepared: PreparedBody,
+    if_none_match: Optional[str] = None,
+    accept_encoding: Optional[str] = None,
+    headers: Optional[dict] = None,
+) -> Response:
+    if etag_matches(if_none_match, prepared.etag):
+        return not_modified(prepared.etag, headers)
+
+    body = prepared.body
+    encoding = None
+    if prepared.gzip is not None:
+        accepted = _accepted_encodings(accept_encoding)
+        if prepared.br is not None and "br" in accepted:
+            body, encoding = prepared.br, "br"
+        elif "gzip" in accepted:
+            body, encoding = prepared.gzip, "gzip"
+
+    response = RawJSONResponse(body, headers=headers)
+    response.headers["ETag"] = prepared.etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    response.headers["Vary"] = "Accept-Encoding"
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    return response
@@ -0,0 +1,103 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Iterable, Optional
+
+_MISSING = object()
+
+
+class LocalCache:
+    def __init__(self, name: str, max_entries: int = 256, ttl: float = 60.0):
+        self.name = name
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._tag_index: dict = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    def _drop(self, key: str):
+        entry = self._data.pop(key, _MISSING)
+        if entry is _MISSING:
+            return _MISSING
+        for tag in entry[2]:
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[tag]
+        return entry
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self._misses += 1
+                return default
+            expires_at, value, _ = entry
+            if expires_at <= now:
+                self._drop(key)
+                self._expirations += 1
+                self._misses += 1
+                return default
+            self._data.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, tags: Iterable[str] = ()) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        tags = tuple(tags)
+        with self._lock:
+            self._drop(key)
+            self._data[key] = (expires_at, value, tags)
+            for tag in tags:
+                self._tag_index.setdefault(tag, set()).add(key)
+            while len(self._data) > self.max_entries:
+                self._drop(next(iter(self._data)))
+                self._evictions += 1
+
+    def delete(self, *keys: str) -> int:
+        removed = 0
+        with self._lock:
+            for key in keys:
+                if self._drop(key) is not _MISSING:
+                    removed += 1
+            self._invalidations += removed
+        return removed
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        removed = 0
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tag_index.get(tag, ())):
+                    if self._drop(key) is not _MISSING:
+                        removed += 1
+            self._invalidations += removed
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._invalidations += len(self._data)
+            self._data.clear()
+            self._tag_index.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "name": self.name,
+                "size": len(self._data),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations,
+            }
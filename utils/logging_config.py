@@ -0,0 +1,224 @@
+import os
+import re
+import sys
+import copy
+import json
+import uuid
+import time
+import queue
+import atexit
+import logging
+import threading
+import contextvars
+from collections import OrderedDict
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_HOT_PATH_RATE = float(os.getenv("LOG_HOT_PATH_RATE", "5"))
+LOG_HOT_PATH_BURST = int(os.getenv("LOG_HOT_PATH_BURST", "20"))
+# Plantillas con bucket propio; al superarlo se descarta la menos usada recientemente.
+LOG_HOT_PATH_MAX_KEYS = int(os.getenv("LOG_HOT_PATH_MAX_KEYS", "1024"))
+# Loggers del camino caliente: sus mensajes por debajo de ERROR se limitan por plantilla.
+LOG_HOT_PATH_LOGGERS = tuple(
+    name.strip()
+    for name in os.getenv(
+        "LOG_HOT_PATH_LOGGERS",
+        "utils.database,utils.redis_cache,utils.security,controllers.moviescatalog,controllers.users",
+    ).split(",")
+    if name.strip()
+)
+
+request_id_var: contextvars.ContextVar = contextvars.ContextVar("request_id", default="-")
+
+_listener: Optional[QueueListener] = None
+_handler: Optional[QueueHandler] = None
+_setup_lock = threading.Lock()
+
+
+class RequestIdFilter(logging.Filter):
+    # Corre en el hilo que emite el log, donde el contextvar de la petición sigue vigente.
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class HotPathRateLimitFilter(logging.Filter):
+    # Token bucket por (logger, nivel, plantilla): el mensaje se descarta antes de formatearse.
+    def __init__(self, prefixes: tuple, rate: float, burst: int, max_keys: int = LOG_HOT_PATH_MAX_KEYS):
+        super().__init__()
+        self.prefixes = prefixes
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max(1, max_keys)
+        self._buckets: OrderedDict = OrderedDict()
+        self._suppressed: dict = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.ERROR or not record.name.startswith(self.prefixes):
+            return True
+        key = (record.name, record.levelno, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            # Un mensaje formateado con f-string crea una plantilla nueva por valor: el mapa se acota.
+            while len(self._buckets) > self.max_keys:
+                evicted, _ = self._buckets.popitem(last=False)
+                self._suppressed.pop(evicted, None)
+            if tokens < 1:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                return False
+            self._buckets[key] = (tokens - 1, now)
+            suppressed = self._suppressed.pop(key, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+        }
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            entry["suppressed"] = suppressed
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        if not hasattr(record, "request_id"):
+            record.request_id = "-"
+        text = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        return f"{text} (+{suppressed} suprimidos)" if suppressed else text
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Solo se interpola el mensaje (ya filtrado); el formato final se hace en el hilo del listener.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        # Si el hilo de escritura se atrasa, se pierde el log en lugar de bloquear el event loop.
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+
+class RequestIdMiddleware:
+    # Middleware ASGI puro: evita el costo de BaseHTTPMiddleware en cada petición.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", ()):
+            if name == b"x-request-id":
+                candidate = value.decode("latin-1")
+                if _REQUEST_ID_RE.match(candidate):
+                    request_id = candidate
+                break
+        if request_id is None:
+            request_id = uuid.uuid4().hex
+        header = (b"x-request-id", request_id.encode("latin-1"))
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), header]
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
+
+
+def route_uvicorn_loggers() -> None:
+    # Uvicorn (y su worker de gunicorn) traen sus propios handlers; se redirigen al mismo pipeline.
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = []
+        uvicorn_logger.propagate = True
+
+
+def setup_logging() -> None:
+    global _listener, _handler
+    with _setup_lock:
+        if _listener is not None:
+            return
+
+        output = logging.StreamHandler(sys.stdout)
+        output.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+
+        handler = _NonBlockingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+        handler.addFilter(RequestIdFilter())
+        handler.addFilter(HotPathRateLimitFilter(LOG_HOT_PATH_LOGGERS, LOG_HOT_PATH_RATE, LOG_HOT_PATH_BURST))
+
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(handler)
+        root.setLevel(LOG_LEVEL)
+        route_uvicorn_loggers()
+
+        _handler = handler
+        _listener = QueueListener(handler.queue, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def _restart_after_fork() -> None:
+    # El hilo del listener no sobrevive al fork (gunicorn --preload): cada worker abre su propia cola.
+    global _listener, _setup_lock
+    _setup_lock = threading.Lock()
+    if _listener is None:
+        return
+    _handler.queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _listener = QueueListener(_handler.queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
@@ -0,0 +1,158 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterable, List, Tuple
+
+from opentelemetry import metrics, trace
+from opentelemetry.metrics import Observation
+
+_tracer = trace.get_tracer("movies_api")
+_meter = metrics.get_meter("movies_api")
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry: list = []
+_collectors: List[Callable[[], Iterable[Tuple[str, str, str, dict, float]]]] = []
+_cache_stats: List[Callable[[], dict]] = []
+
+
+def _labels_text(labels: dict) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{key}="{str(value)}"' for key, value in sorted(labels.items()))
+    return "{" + pairs + "}"
+
+
+class Histogram:
+    # Se registra en la exportación de OpenTelemetry y, además, localmente para /metrics.
+    def __init__(self, name: str, description: str, unit: str = "s", buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self._series: dict = {}
+        self._lock = threading.Lock()
+        self._otel = _meter.create_histogram(name, unit=unit, description=description)
+        _registry.append(self)
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][position] += 1
+            series[1] += value
+            series[2] += 1
+        self._otel.record(value, labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(dict(key), list(counts), total, count) for key, (counts, total, count) in self._series.items()]
+        for labels, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_labels_text({**labels, 'le': bound})} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels_text({**labels, 'le': '+Inf'})} {count}")
+            lines.append(f"{self.name}_sum{_labels_text(labels)} {total}")
+            lines.append(f"{self.name}_count{_labels_text(labels)} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._series: dict = {}
+        self._lock = threading.Lock()
+        self._otel = _meter.create_counter(name, description=description)
+        _registry.append(self)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+        self._otel.add(amount, labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            snapshot = list(self._series.items())
+        for key, value in snapshot:
+            lines.append(f"{self.name}{_labels_text(dict(key))} {value}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "movies_api_stage_duration_seconds",
+    "Duración de cada etapa del camino caliente (BD, caché, JWT, Firebase, JSON).",
+)
+STAGE_ERRORS = Counter(
+    "movies_api_stage_errors_total",
+    "Errores por etapa del camino caliente.",
+)
+
+
+@contextmanager
+def stage(name: str, **attributes):
+    started = time.perf_counter()
+    with _tracer.start_as_current_span(name, attributes=attributes or None):
+        try:
+            yield
+        except Exception:
+            STAGE_ERRORS.inc(stage=name)
+            raise
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - started, stage=name)
+
+
+def register_collector(collector: Callable[[], Iterable[Tuple[str, str, str, dict, float]]]) -> None:
+    # Cada colector devuelve muestras (nombre, tipo, ayuda, labels, valor) calculadas al momento del scrape.
+    _collectors.append(collector)
+
+
+def register_cache_stats(provider: Callable[[], dict]) -> None:
+    # provider es el stats() de una caché: debe incluir "name", "hits" y "misses".
+    _cache_stats.append(provider)
+
+
+def _cache_observations(field: str):
+    def callback(options):
+        for provider in _cache_stats:
+            stats = provider()
+            yield Observation(stats[field], {"cache": stats["name"]})
+    return callback
+
+
+def _cache_samples():
+    snapshot = [provider() for provider in _cache_stats]
+    for stats in snapshot:
+        yield "movies_api_cache_hits_total", "counter", "Aciertos de caché.", {"cache": stats["name"]}, stats["hits"]
+    for stats in snapshot:
+        yield "movies_api_cache_misses_total", "counter", "Fallos de caché.", {"cache": stats["name"]}, stats["misses"]
+    for stats in snapshot:
+        yield "movies_api_cache_hit_ratio", "gauge", "Proporción de aciertos de caché.", {"cache": stats["name"]}, stats["hit_ratio"]
+
+
+_meter.create_observable_counter("movies_api_cache_hits", callbacks=[_cache_observations("hits")], description="Aciertos de caché.")
+_meter.create_observable_counter("movies_api_cache_misses", callbacks=[_cache_observations("misses")], description="Fallos de caché.")
+_meter.create_observable_gauge("movies_api_cache_hit_ratio", callbacks=[_cache_observations("hit_ratio")], description="Proporción de aciertos de caché.")
+register_collector(_cache_samples)
+
+
+def render_prometheus() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    declared = set()
+    for collector in _collectors:
+        for name, kind, description, labels, value in collector():
+            if name not in declared:
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} {kind}")
+                declared.add(name)
+            lines.append(f"{name}{_labels_text(labels)} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,170 @@
+import os
+import math
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from fastapi import HTTPException, Request
+from redis.exceptions import NoScriptError
+
+from utils.redis_cache import get_redis_client
+from utils.security import get_request_claims
+from utils.admission import queue_timeout_override
+from utils.metrics import Counter, stage
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_LOCAL_MAX_KEYS = int(os.getenv("RATE_LIMIT_LOCAL_MAX_KEYS", "10000"))
+
+# Política por ruta: (tokens por segundo, ráfaga, espera máxima en cola de BD/Firebase en segundos).
+# Se sobreescribe con RATE_LIMIT_<RUTA>="tasa/ráfaga" y QUEUE_TIMEOUT_<RUTA>="segundos".
+DEFAULT_ROUTE_POLICIES = {
+    "login": (5, 10, 2.0),
+    "signup": (1, 5, 5.0),
+    "token": (5, 10, 2.0),
+    "catalog": (20, 40, 1.0),
+    "search": (20, 40, 1.0),
+    "stats": (2, 5, 5.0),
+    "export": (1, 3, 5.0),
+    "catalog_write": (5, 10, 5.0),
+    "import": (0.2, 2, 30.0),
+    "users_write": (5, 10, 5.0),
+}
+
+RATE_LIMITED = Counter(
+    "movies_api_rate_limited_total",
+    "Peticiones rechazadas con 429 por el limitador de tasa.",
+)
+
+# Token bucket atómico en Redis: el reloj es el del servidor, común a todos los workers.
+_TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('time')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local state = redis.call('hmget', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate / 1000)
+local wait_ms = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait_ms = math.ceil((1 - tokens) * 1000 / rate)
+end
+redis.call('hset', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('pexpire', KEYS[1], math.ceil(burst * 1000 / rate) + 1000)
+return wait_ms
+"""
+_TOKEN_BUCKET_SHA = hashlib.sha1(_TOKEN_BUCKET_SCRIPT.encode()).hexdigest()
+
+
+class RoutePolicy:
+    __slots__ = ("name", "rate", "burst", "queue_timeout")
+
+    def __init__(self, name: str, rate: float, burst: int, queue_timeout: float):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.queue_timeout = queue_timeout
+
+
+def get_route_policy(name: str) -> RoutePolicy:
+    rate, burst, queue_timeout = DEFAULT_ROUTE_POLICIES[name]
+    override = os.getenv(f"RATE_LIMIT_{name.upper()}")
+    if override:
+        rate_text, _, burst_text = override.partition("/")
+        rate = float(rate_text)
+        burst = int(burst_text) if burst_text else burst
+    queue_timeout = float(os.getenv(f"QUEUE_TIMEOUT_{name.upper()}", str(queue_timeout)))
+    return RoutePolicy(name, rate, burst, queue_timeout)
+
+
+class LocalTokenBuckets:
+    # Respaldo en proceso cuando Redis no está disponible: el límite pasa a ser por worker.
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: int) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - last) * rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+_local_buckets = LocalTokenBuckets(RATE_LIMIT_LOCAL_MAX_KEYS)
+
+
+def _client_identity(request: Request) -> str:
+    # Con un token válido el límite es por usuario; si no, por IP (detrás de un proxy, request.client
+    # es el cliente real solo si el proxy está en TRUSTED_PROXY_IPS).
+    if request.headers.get("Authorization"):
+        try:
+            email = get_request_claims(request).get("email")
+            if email:
+                return f"user:{email}"
+        except HTTPException:
+            pass
+    return f"ip:{_client_host(request)}"
+
+
+def _client_host(request: Request) -> str:
+    if not request.client or not request.client.host:
+        return "unknown"
+    host = request.client.host
+    # App Service añade el puerto de origen a X-Forwarded-For ("1.2.3.4:51234"): sin quitarlo,
+    # cada conexión del mismo cliente tendría su propio bucket.
+    if host.count(":") == 1:
+        host = host.split(":", 1)[0]
+    elif host.startswith("[") and "]:" in host:
+        host = host[1:host.index("]:")]
+    return host
+
+
+async def _take_token(key: str, policy: RoutePolicy) -> float:
+    redis_client = get_redis_client()
+    if redis_client is not None:
+        try:
+            with stage("redis.rate_limit"):
+                try:
+                    wait_ms = await redis_client.evalsha(_TOKEN_BUCKET_SHA, 1, key, policy.rate, policy.burst)
+                except NoScriptError:
+                    wait_ms = await redis_client.eval(_TOKEN_BUCKET_SCRIPT, 1, key, policy.rate, policy.burst)
+            return int(wait_ms) / 1000
+        except Exception as e:
+            logger.warning("⚠️ Limitador de tasa sin Redis, se usa el respaldo local: %s", e)
+    return _local_buckets.take(key, policy.rate, policy.burst)
+
+
+def rate_limit(route: str):
+    policy = get_route_policy(route)
+
+    async def dependency(request: Request) -> None:
+        # También fija cuánto puede esperar esta ruta en las colas de admisión de BD y Firebase.
+        queue_timeout_override.set(policy.queue_timeout)
+        if not RATE_LIMIT_ENABLED:
+            return
+        key = f"ratelimit:{policy.name}:{_client_identity(request)}"
+        wait = await _take_token(key, policy)
+        if wait > 0:
+            RATE_LIMITED.inc(route=policy.name)
+            raise HTTPException(
+                status_code=429,
+                detail="Demasiadas solicitudes, intente de nuevo más tarde.",
+                headers={"Retry-After": str(max(1, math.ceil(wait)))},
+            )
+
+    return dependency
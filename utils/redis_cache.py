@@ -1,76 +1,520 @@
 import os
 import json
+import time
+import uuid
+import asyncio
 import logging
-import redis
-from typing import Optional, Any
-from dotenv import load_dotenv
+import redis.asyncio as redis
+from typing import Optional, Any, Callable, Awaitable
 
-load_dotenv()
+from utils.singleflight import single_flight
+from utils.metrics import stage, register_cache_stats
 
 logger = logging.getLogger(__name__)
 
 REDIS_URL = os.getenv("REDIS_CONNECTION_STRING")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "5"))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+REDIS_PUBSUB_POLL_INTERVAL = float(os.getenv("REDIS_PUBSUB_POLL_INTERVAL", "1"))
+CACHE_INVALIDATION_CHANNEL = os.getenv("CACHE_INVALIDATION_CHANNEL", "movies:cache:invalidate")
+CACHE_FILL_LOCK_TTL_MS = int(os.getenv("CACHE_FILL_LOCK_TTL_MS", "5000"))
+CACHE_FILL_WAIT_INTERVAL = float(os.getenv("CACHE_FILL_WAIT_INTERVAL", "0.05"))
+
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+_client: Optional[redis.Redis] = None
+_invalidation_handlers: list = []
+_invalidation_listener: Optional[asyncio.Task] = None
+_refresh_tasks: dict[str, asyncio.Task] = {}
+_stats = {
+    "hits": 0,
+    "misses": 0,
+    "stale": 0,
+    "soft_expired": 0,
+    "refreshes": 0,
+    "stores": 0,
+    "deletes": 0,
+    "invalidations": 0,
+    "errors": 0,
+    "fills": 0,
+    "fill_waits": 0,
+}
+
+async def init_redis() -> Optional[redis.Redis]:
+    global _client
+    if _client is not None:
+        return _client
 
-def get_redis_client() -> Optional[redis.Redis]:
     if not REDIS_URL:
         logger.error("La variable de entorno REDIS_CONNECTION_STRING no está definida.")
         return None
 
+    client = redis.from_url(
+        REDIS_URL,
+        decode_responses=True,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+        health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+    )
     try:
-        client = redis.from_url(
-            REDIS_URL,
-            decode_responses=True
-        )
-        client.ping()
+        await client.ping()
         logger.info("✅ Conectado exitosamente a Redis usando Connection String")
+        _client = client
         return client
     except Exception as e:
         logger.error(f"❌ Error al conectar a Redis con Connection String: {e}")
+        await client.aclose()
         return None
 
-def get_from_cache(redis_client: Optional[redis.Redis], cache_key: str) -> Optional[Any]:
+async def close_redis() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        logger.info("Pool de conexiones Redis cerrado.")
+
+def get_redis_client() -> Optional[redis.Redis]:
+    return _client
+
+async def get_from_cache(redis_client: Optional[redis.Redis], cache_key: str) -> Optional[Any]:
     if not redis_client:
-        logger.info("ℹ Redis no disponible - lectura de caché omitida")
+        logger.debug("ℹ Redis no disponible - lectura de caché omitida")
         return None
 
     try:
-        cached_data = redis_client.get(cache_key)
+        with stage("redis.get"):
+            cached_data = await redis_client.get(cache_key)
         if cached_data:
-            logger.info(f"✅ Cache hit para la clave: {cache_key}")
-            return json.loads(cached_data)
+            logger.debug("✅ Cache hit para la clave: %s", cache_key)
+            _stats["hits"] += 1
+            with stage("json.deserialize"):
+                return json.loads(cached_data)
+        _stats["misses"] += 1
     except json.JSONDecodeError as e:
-        logger.warning(f"⚠️ Datos corruptos en caché para la clave '{cache_key}', eliminando: {str(e)}")
-        redis_client.delete(cache_key)
+        logger.warning("⚠️ Datos corruptos en caché para la clave '%s', eliminando: %s", cache_key, e)
+        _stats["errors"] += 1
+        await redis_client.delete(cache_key)
     except Exception as e:
-        logger.warning(f"⚠️ Fallo al obtener la clave '{cache_key}' desde caché: {str(e)}")
+        logger.warning("⚠️ Fallo al obtener la clave '%s' desde caché: %s", cache_key, e)
+        _stats["errors"] += 1
 
     return None
 
-def delete_cache(redis_client: Optional[redis.Redis], cache_key: str) -> bool:
+async def delete_cache(redis_client: Optional[redis.Redis], cache_key: str) -> bool:
     if not redis_client:
-        logger.info("ℹ Redis no disponible - eliminación de caché omitida")
+        logger.debug("ℹ Redis no disponible - eliminación de caché omitida")
         return False
 
     try:
-        result = redis_client.delete(cache_key)
+        with stage("redis.delete"):
+            result = await redis_client.delete(cache_key)
+        _stats["deletes"] += 1
         if result:
-            logger.info(f"🗑️ Clave de caché '{cache_key}' eliminada exitosamente")
+            logger.debug("🗑️ Clave de caché '%s' eliminada exitosamente", cache_key)
             return True
         else:
-            logger.info(f"ℹ Clave de caché '{cache_key}' no existía")
+            logger.debug("ℹ Clave de caché '%s' no existía", cache_key)
             return False
     except Exception as e:
-        logger.warning(f"⚠️ Error al eliminar la clave de caché '{cache_key}': {str(e)}")
+        logger.warning("⚠️ Error al eliminar la clave de caché '%s': %s", cache_key, e)
         return False
 
-def store_in_cache(redis_client: Optional[redis.Redis], cache_key: str, data: list[dict], expiration: int) -> None:
+async def store_in_cache(
+    redis_client: Optional[redis.Redis],
+    cache_key: str,
+    data: Any,
+    expiration: int,
+    serialized: bool = False,
+) -> None:
+    if not redis_client:
+        logger.debug("ℹ Redis no disponible - se omite almacenamiento en caché")
+        return
+
+    try:
+        if serialized:
+            json_data = data
+        else:
+            with stage("json.serialize"):
+                json_data = json.dumps(data, default=str)
+        with stage("redis.set"):
+            await redis_client.setex(cache_key, expiration, json_data)
+        _stats["stores"] += 1
+        logger.debug("📦 Datos almacenados en caché con clave '%s' por %s segundos", cache_key, expiration)
+    except Exception as e:
+        logger.warning("⚠️ Fallo al almacenar datos en caché con clave '%s': %s", cache_key, e)
+        _stats["errors"] += 1
+
+def _tag_key(tag: str) -> str:
+    return f"cache:tag:{tag}"
+
+async def get_tag_versions(redis_client: Optional[redis.Redis], tags: list[str]) -> Optional[list[int]]:
+    if not redis_client or not tags:
+        return None
+    try:
+        with stage("redis.mget"):
+            versions = await redis_client.mget(*(_tag_key(tag) for tag in tags))
+        return [int(version or 0) for version in versions]
+    except Exception as e:
+        logger.warning("⚠️ Fallo al leer versiones de tags %s: %s", list(tags), e)
+        _stats["errors"] += 1
+        return None
+
+def _encode_raw(versions: list[int], data: tuple[str, dict], soft_expiry: Optional[float] = None) -> str:
+    # Entrada "raw": una línea de cabecera con versiones y metadatos, seguida del cuerpo JSON
+    # final tal cual; en un hit solo se decodifica la cabecera, nunca el cuerpo.
+    body, meta = data
+    header = {"v": versions, "m": meta}
+    if soft_expiry is not None:
+        header["s"] = soft_expiry
+    return json.dumps(header) + "\n" + body
+
+def _decode_raw(cached_data: str) -> tuple[Optional[list[int]], tuple[str, dict], Optional[float]]:
+    header, _, body = cached_data.partition("\n")
+    header = json.loads(header)
+    return header.get("v"), (body, header.get("m") or {}), header.get("s")
+
+async def _read_entry(
+    redis_client: Optional[redis.Redis],
+    cache_key: str,
+    tags: tuple,
+    raw: bool = False,
+    stale_ttl: int = 0,
+) -> tuple[Optional[Any], Optional[list[int]], bool]:
+    # El tercer valor indica que la entrada pasó su expiración blanda: se puede servir,
+    # pero hay que refrescarla.
+    if not tags and not raw and not stale_ttl:
+        return await get_from_cache(redis_client, cache_key), None, False
+    if not redis_client:
+        return None, None, False
+
+    # Una sola ida y vuelta: la entrada y la versión actual de cada tag de los que depende.
+    try:
+        with stage("redis.mget"):
+            cached_data, *versions = await redis_client.mget(cache_key, *(_tag_key(tag) for tag in tags))
+        versions = [int(version or 0) for version in versions]
+        if cached_data:
+            with stage("json.deserialize"):
+                if raw:
+                    entry_versions, data, soft_expiry = _decode_raw(cached_data)
+                else:
+                    entry = json.loads(cached_data)
+                    entry_versions, data, soft_expiry = entry.get("v"), entry["d"], entry.get("s")
+            # Una entrada con tags invalidados nunca se sirve, ni siquiera como obsoleta.
+            if entry_versions == versions:
+                logger.debug("✅ Cache hit para la clave: %s", cache_key)
+                _stats["hits"] += 1
+                expired = soft_expiry is not None and time.time() >= soft_expiry
+                if expired:
+                    _stats["soft_expired"] += 1
+                return data, versions, expired
+            _stats["stale"] += 1
+        _stats["misses"] += 1
+        return None, versions, False
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+        logger.warning("⚠️ Datos corruptos en caché para la clave '%s', eliminando: %s", cache_key, e)
+        _stats["errors"] += 1
+        await delete_cache(redis_client, cache_key)
+    except Exception as e:
+        logger.warning("⚠️ Fallo al obtener la clave '%s' desde caché: %s", cache_key, e)
+        _stats["errors"] += 1
+    return None, None, False
+
+async def _store_entry(
+    redis_client: Optional[redis.Redis],
+    cache_key: str,
+    data: Any,
+    expiration: int,
+    versions: Optional[list[int]],
+    raw: bool = False,
+    stale_ttl: int = 0,
+) -> None:
+    # Con stale_ttl la clave vive expiration + stale_ttl en Redis, pero pasado expiration
+    # queda marcada como vencida (expiración blanda) y se refresca en segundo plano.
+    soft_expiry = time.time() + expiration if stale_ttl else None
+    ttl = expiration + stale_ttl
+    if raw:
+        await store_in_cache(redis_client, cache_key, _encode_raw(versions or [], data, soft_expiry), ttl, serialized=True)
+        return
+    if versions is None and soft_expiry is None:
+        await store_in_cache(redis_client, cache_key, data, ttl)
+        return
+    entry = {"v": versions or [], "d": data}
+    if soft_expiry is not None:
+        entry["s"] = soft_expiry
+    await store_in_cache(redis_client, cache_key, entry, ttl)
+
+async def _wait_for_fill(
+    redis_client: redis.Redis,
+    cache_key: str,
+    lock_key: str,
+    tags: tuple,
+    raw: bool = False,
+    stale_ttl: int = 0,
+):
+    _stats["fill_waits"] += 1
+    deadline = asyncio.get_running_loop().time() + CACHE_FILL_LOCK_TTL_MS / 1000
+    while asyncio.get_running_loop().time() < deadline:
+        await asyncio.sleep(CACHE_FILL_WAIT_INTERVAL)
+        try:
+            cached_data, versions, _ = await _read_entry(redis_client, cache_key, tags, raw, stale_ttl)
+            if cached_data is not None:
+                return cached_data, versions
+            if not await redis_client.exists(lock_key):
+                return None, versions
+        except Exception as e:
+            logger.warning("⚠️ Fallo esperando el llenado de '%s': %s", cache_key, e)
+            break
+    return None, None
+
+async def _fill_cache(
+    redis_client: Optional[redis.Redis],
+    cache_key: str,
+    loader: Callable[[], Awaitable[Any]],
+    expiration: int,
+    tags: tuple,
+    versions: Optional[list[int]],
+    raw: bool = False,
+    stale_ttl: int = 0,
+) -> Any:
+    lock_key = f"lock:{cache_key}"
+    token = None
+    if redis_client:
+        try:
+            token = uuid.uuid4().hex
+            if not await redis_client.set(lock_key, token, nx=True, px=CACHE_FILL_LOCK_TTL_MS):
+                token = None
+                # Otro worker está llenando la clave: se espera su resultado antes de ir a la BD.
+                cached_data, fresh_versions = await _wait_for_fill(redis_client, cache_key, lock_key, tags, raw, stale_ttl)
+            else:
+                cached_data, fresh_versions, _ = await _read_entry(redis_client, cache_key, tags, raw, stale_ttl)
+            if cached_data is not None:
+                return cached_data, fresh_versions
+            if fresh_versions is not None:
+                versions = fresh_versions
+        except Exception as e:
+            logger.warning("⚠️ Fallo al coordinar el llenado de '%s': %s", cache_key, e)
+            token = None
+
+    try:
+        _stats["fills"] += 1
+        data = await loader()
+        # Las versiones se leyeron antes de consultar la BD: si hubo una invalidación
+        # entretanto, la entrada queda obsoleta en lugar de servir datos viejos.
+        # None no se guarda: al leerlo se trataría como fallo y solo costaría una escritura.
+        if data is not None and (not tags or versions is not None):
+            await _store_entry(redis_client, cache_key, data, expiration, versions, raw, stale_ttl)
+            return data, versions
+        return data, None
+    finally:
+        if token:
+            try:
+                await redis_client.eval(_RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+            except Exception as e:
+                logger.warning("⚠️ Fallo al liberar el lock de '%s': %s", cache_key, e)
+
+async def _refresh_entry(
+    redis_client: redis.Redis,
+    cache_key: str,
+    loader: Callable[[], Awaitable[Any]],
+    expiration: int,
+    tags: tuple,
+    raw: bool,
+    stale_ttl: int,
+) -> None:
+    lock_key = f"lock:{cache_key}"
+    token = uuid.uuid4().hex
+    acquired = False
+    try:
+        # Si otro worker ya está refrescando la clave, este sigue sirviendo la entrada vencida.
+        acquired = await redis_client.set(lock_key, token, nx=True, px=CACHE_FILL_LOCK_TTL_MS)
+        if not acquired:
+            return
+        versions = await get_tag_versions(redis_client, list(tags)) if tags else []
+        if versions is None:
+            return
+        _stats["refreshes"] += 1
+        data = await loader()
+        await _store_entry(redis_client, cache_key, data, expiration, versions, raw, stale_ttl)
+    except Exception as e:
+        logger.warning("⚠️ Fallo al refrescar en segundo plano la clave '%s': %s", cache_key, e)
+        _stats["errors"] += 1
+    finally:
+        if acquired:
+            try:
+                await redis_client.eval(_RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+            except Exception as e:
+                logger.warning("⚠️ Fallo al liberar el lock de '%s': %s", cache_key, e)
+
+def _schedule_refresh(redis_client: redis.Redis, cache_key: str, *args) -> None:
+    # Un refresco por clave y worker; entre workers lo coordina el lock de llenado.
+    if cache_key in _refresh_tasks:
+        return
+    task = asyncio.get_running_loop().create_task(_refresh_entry(redis_client, cache_key, *args))
+    _refresh_tasks[cache_key] = task
+    task.add_done_callback(lambda _: _refresh_tasks.pop(cache_key, None))
+
+async def cancel_pending_refreshes() -> None:
+    tasks = list(_refresh_tasks.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+async def prime_cache(
+    redis_client: Optional[redis.Redis],
+    cache_key: str,
+    data: Any,
+    expiration: int,
+    tags: tuple = (),
+) -> None:
+    # Escribe una entrada conocida sin pasar por el loader (p. ej. justo después de un INSERT).
     if not redis_client:
-        logger.info("ℹ Redis no disponible - se omite almacenamiento en caché")
         return
+    tags = tuple(tags)
+    versions = None
+    if tags:
+        versions = await get_tag_versions(redis_client, list(tags))
+        if versions is None:
+            return
+    await _store_entry(redis_client, cache_key, data, expiration, versions)
+
+async def get_or_fill(
+    redis_client: Optional[redis.Redis],
+    cache_key: str,
+    loader: Callable[[], Awaitable[Any]],
+    expiration: int,
+    tags: tuple = (),
+    raw: bool = False,
+    stale_ttl: int = 0,
+    with_versions: bool = False,
+) -> Any:
+    # Con raw=True el loader devuelve (cuerpo JSON ya serializado, metadatos) y se guarda sin re-codificar.
+    # Con stale_ttl > 0, una entrada vencida se sirve de inmediato mientras una tarea la refresca.
+    # Con with_versions=True devuelve (datos, versiones de tags con que se validó o guardó la entrada);
+    # las versiones son None si el dato no quedó ligado a ellas (sin Redis o con la lectura fallida).
+    tags = tuple(tags)
+    cached_data, versions, expired = await _read_entry(redis_client, cache_key, tags, raw, stale_ttl)
+    if cached_data is not None:
+        if expired:
+            _schedule_refresh(redis_client, cache_key, loader, expiration, tags, raw, stale_ttl)
+        return (cached_data, versions) if with_versions else cached_data
+    data, versions = await single_flight(
+        cache_key,
+        lambda: _fill_cache(redis_client, cache_key, loader, expiration, tags, versions, raw, stale_ttl),
+    )
+    return (data, versions) if with_versions else data
 
+async def invalidate_tags(redis_client: Optional[redis.Redis], tags: list[str]) -> None:
+    if not redis_client or not tags:
+        return
+
+    # Incrementar la versión de cada tag invalida todas las entradas que dependen de él,
+    # sin importar cuántas claves existan; la publicación va en el mismo pipeline.
     try:
-        json_data = json.dumps(data, default=str)
-        redis_client.setex(cache_key, expiration, json_data)
-        logger.info(f"📦 Datos almacenados en caché con clave '{cache_key}' por {expiration} segundos")
+        pipe = redis_client.pipeline(transaction=False)
+        for tag in tags:
+            pipe.incr(_tag_key(tag))
+        pipe.publish(CACHE_INVALIDATION_CHANNEL, json.dumps({"tags": list(tags)}))
+        with stage("redis.invalidate"):
+            results = await pipe.execute()
+        _stats["invalidations"] += len(tags)
+        logger.info("🗑️ Tags invalidados: %s (%s suscriptor(es) notificados)", list(tags), results[-1])
     except Exception as e:
-        logger.warning(f"⚠️ Fallo al almacenar datos en caché con clave '{cache_key}': {str(e)}")
+        logger.warning("⚠️ Fallo al invalidar tags de caché %s: %s", list(tags), e)
+        _stats["errors"] += 1
+
+def _subscriber_client(redis_client: redis.Redis) -> redis.Redis:
+    # Conexión propia para la suscripción, sin socket_timeout: en un canal inactivo la lectura no debe
+    # vencer cada REDIS_SOCKET_TIMEOUT segundos y forzar una resuscripción (se perderían mensajes).
+    pool = redis_client.connection_pool
+    return redis.Redis(
+        connection_pool=pool.__class__(
+            connection_class=pool.connection_class,
+            max_connections=1,
+            **{**pool.connection_kwargs, "socket_timeout": None},
+        )
+    )
+
+async def _listen_invalidations(redis_client: redis.Redis, on_tags: Callable[[list[str]], None]) -> None:
+    backoff = 1.0
+    subscriber = _subscriber_client(redis_client)
+    try:
+        while True:
+            pubsub = subscriber.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(CACHE_INVALIDATION_CHANNEL)
+                logger.info("📡 Suscrito a invalidaciones en el canal '%s'", CACHE_INVALIDATION_CHANNEL)
+                backoff = 1.0
+                while True:
+                    # get_message con timeout devuelve None si no hay mensajes: no es una desconexión.
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=REDIS_PUBSUB_POLL_INTERVAL)
+                    if message is None:
+                        continue
+                    try:
+                        on_tags(json.loads(message["data"])["tags"])
+                    except Exception as e:
+                        logger.warning("⚠️ Mensaje de invalidación inválido: %s", e)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("⚠️ Suscripción a invalidaciones interrumpida, reintentando en %ss: %s", backoff, e)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+    finally:
+        # El pool propio se pasó como connection_pool: aclose() no lo desconecta.
+        await subscriber.aclose()
+        await subscriber.connection_pool.disconnect()
+
+def subscribe_invalidations(redis_client: Optional[redis.Redis], on_tags: Callable[[list[str]], None]) -> Optional[asyncio.Task]:
+    if not redis_client:
+        logger.info("ℹ Redis no disponible - sin suscripción a invalidaciones")
+        return None
+    return asyncio.create_task(_listen_invalidations(redis_client, on_tags))
+
+def add_invalidation_handler(handler: Callable[[list[str]], None]) -> None:
+    if handler not in _invalidation_handlers:
+        _invalidation_handlers.append(handler)
+
+def _dispatch_invalidation(tags: list[str]) -> None:
+    for handler in list(_invalidation_handlers):
+        try:
+            handler(tags)
+        except Exception as e:
+            logger.warning("⚠️ Error en el manejador de invalidación %s: %s", getattr(handler, "__qualname__", handler), e)
+
+def start_invalidation_listener() -> None:
+    # Una sola suscripción por worker; cada caché local registra su manejador con add_invalidation_handler.
+    global _invalidation_listener
+    if _invalidation_listener is None:
+        _invalidation_listener = subscribe_invalidations(_client, _dispatch_invalidation)
+
+async def stop_invalidation_listener() -> None:
+    global _invalidation_listener
+    if _invalidation_listener is not None:
+        _invalidation_listener.cancel()
+        try:
+            await _invalidation_listener
+        except asyncio.CancelledError:
+            pass
+        _invalidation_listener = None
+
+def get_cache_stats() -> dict:
+    lookups = _stats["hits"] + _stats["misses"]
+    return {
+        "name": "redis",
+        **_stats,
+        "hit_ratio": round(_stats["hits"] / lookups, 4) if lookups else 0.0,
+    }
+
+register_cache_stats(get_cache_stats)
@@ -0,0 +1,158 @@
+import re
+import heapq
+import bisect
+import unicodedata
+from typing import Iterable, List, Optional
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+PREFIX_FILTER_THRESHOLD = 2000
+
+
+def tokenize(text: str) -> List[str]:
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return _TOKEN_RE.findall(text)
+
+
+class TitleSearchIndex:
+    def __init__(self, rescan_window: int = 0):
+        self._docs: dict = {}
+        self._order: dict = {}
+        self._postings: dict = {}
+        self._vocab: List[str] = []
+        self.max_movie_id = 0
+        # Último id leído de la fuente; add() (altas de este worker) no lo mueve.
+        self.loaded_through = 0
+        self.rescan_window = max(0, rescan_window)
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def _index(self, movie_id: int, title: str, genres: Optional[str]) -> List[str]:
+        if movie_id in self._docs:
+            self.remove(movie_id)
+        tokens = tuple(dict.fromkeys(tokenize(title)))
+        self._docs[movie_id] = (title, genres, tokens)
+        self._order[movie_id] = (len(title), movie_id)
+        new_tokens = []
+        for token in tokens:
+            ids = self._postings.get(token)
+            if ids is None:
+                self._postings[token] = {movie_id}
+                new_tokens.append(token)
+            else:
+                ids.add(movie_id)
+        if movie_id > self.max_movie_id:
+            self.max_movie_id = movie_id
+        return new_tokens
+
+    def add(self, movie_id: int, title: str, genres: Optional[str] = None) -> None:
+        for token in self._index(movie_id, title, genres):
+            bisect.insort(self._vocab, token)
+
+    def rescan_from(self) -> int:
+        # Las filas confirmadas tarde pueden tener ids por debajo de loaded_through: se relee una ventana.
+        return max(0, self.loaded_through - self.rescan_window)
+
+    def add_many(self, rows: Iterable[tuple]) -> int:
+        # Filas leídas de la fuente; las ya indexadas sin cambios (ventana releída o add()) se omiten.
+        new_tokens = []
+        added = 0
+        for movie_id, title, genres in rows:
+            if movie_id > self.loaded_through:
+                self.loaded_through = movie_id
+            doc = self._docs.get(movie_id)
+            if doc is not None and doc[0] == title and doc[1] == genres:
+                continue
+            new_tokens.extend(self._index(movie_id, title, genres))
+            added += 1
+        if len(new_tokens) > 64:
+            # Reordenar una vez es más barato que muchas inserciones ordenadas durante la carga inicial.
+            self._vocab = sorted(self._postings)
+        else:
+            for token in new_tokens:
+                bisect.insort(self._vocab, token)
+        return added
+
+    def remove(self, movie_id: int) -> None:
+        doc = self._docs.pop(movie_id, None)
+        if doc is None:
+            return
+        del self._order[movie_id]
+        for token in doc[2]:
+            ids = self._postings.get(token)
+            if ids is None:
+                continue
+            ids.discard(movie_id)
+            if not ids:
+                del self._postings[token]
+                position = bisect.bisect_left(self._vocab, token)
+                if position < len(self._vocab) and self._vocab[position] == token:
+                    del self._vocab[position]
+
+    def _prefix_ids(self, prefix: str) -> set:
+        start = bisect.bisect_left(self._vocab, prefix)
+        end = bisect.bisect_left(self._vocab, prefix + "\U0010ffff")
+        matched = set()
+        for token in self._vocab[start:end]:
+            if token != prefix:
+                matched |= self._postings[token]
+        return matched
+
+    def search(self, query: str, limit: int = 10) -> List[dict]:
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        # Mientras se escribe, el último término se trata como prefijo ("toy st" -> "story").
+        prefix = terms[-1] if not query[-1:].isspace() else None
+        exact_terms = set(terms[:-1] if prefix else terms)
+
+        candidates = None
+        for term in sorted(exact_terms, key=lambda t: len(self._postings.get(t, ()))):
+            ids = self._postings.get(term)
+            if not ids:
+                return []
+            candidates = set(ids) if candidates is None else candidates & ids
+            if not candidates:
+                return []
+
+        order = self._order.__getitem__
+        if prefix is None:
+            ranked = heapq.nsmallest(limit, candidates, key=order)
+        else:
+            # Primero los títulos donde el prefijo es una palabra completa; solo si no alcanzan
+            # para el límite se expande al resto de palabras que empiezan por el prefijo.
+            whole = self._postings.get(prefix, set())
+            if candidates is not None:
+                whole = whole & candidates
+            ranked = heapq.nsmallest(limit, whole, key=order)
+            if len(ranked) < limit:
+                if candidates is not None and len(candidates) <= PREFIX_FILTER_THRESHOLD:
+                    docs = self._docs
+                    partial = [
+                        movie_id for movie_id in candidates
+                        if movie_id not in whole
+                        and any(token.startswith(prefix) for token in docs[movie_id][2])
+                    ]
+                else:
+                    partial = self._prefix_ids(prefix) - whole
+                    if candidates is not None:
+                        partial &= candidates
+                ranked += heapq.nsmallest(limit - len(ranked), partial, key=order)
+
+        docs = self._docs
+        return [
+            {"movieId": movie_id, "title": docs[movie_id][0], "genres": docs[movie_id][1]}
+            for movie_id in ranked
+        ]
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "documents": len(self._docs),
+            "tokens": len(self._vocab),
+            "max_movie_id": self.max_movie_id,
+            "loaded_through": self.loaded_through,
+        }
@@ -1,17 +1,28 @@
 import os
 import jwt
+import time
+import hashlib
 import logging
 from datetime import datetime, timedelta
 from fastapi import HTTPException, Request
 from jwt import PyJWTError
 from functools import wraps
-from dotenv import load_dotenv
+from typing import Optional
+
+from utils.local_cache import LocalCache
+from utils.metrics import stage, register_cache_stats
 
-load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "default_secret")
-logging.basicConfig(level=logging.INFO)
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "1024"))
+AUTH_CACHE_MAX_TTL = float(os.getenv("AUTH_CACHE_MAX_TTL", "300"))
+REFRESH_TOKEN_TTL_DAYS = int(os.getenv("REFRESH_TOKEN_TTL_DAYS", "30"))
+REFRESH_TOKEN_TYPE = "refresh"
 logger = logging.getLogger(__name__)
 
+# Tokens ya verificados, por hash: las peticiones repetidas del mismo cliente no recalculan el HMAC.
+_verified_tokens = LocalCache("jwt_verified", max_entries=AUTH_CACHE_MAX_ENTRIES, ttl=AUTH_CACHE_MAX_TTL)
+register_cache_stats(_verified_tokens.stats)
+
 def create_jwt_token(email: str, active: bool, admin: bool, expires_hours=1):
     try:
         expiration = datetime.utcnow() + timedelta(hours=expires_hours)
@@ -28,68 +39,112 @@ def create_jwt_token(email: str, active: bool, admin: bool, expires_hours=1):
         logger.error(f"Error al crear el token JWT: {e}")
         raise
 
-def decode_jwt_token(token: str):
+def create_refresh_token(email: str, family: str, jti: str, expires_days: int = REFRESH_TOKEN_TTL_DAYS):
+    try:
+        now = datetime.utcnow()
+        payload = {
+            "typ": REFRESH_TOKEN_TYPE,
+            "email": email,
+            "fam": family,
+            "jti": jti,
+            "exp": now + timedelta(days=expires_days),
+            "iat": now
+        }
+        return jwt.encode(payload, SECRET_KEY, algorithm="HS256")
+    except Exception as e:
+        logger.error(f"Error al crear el refresh token: {e}")
+        raise
+
+def decode_refresh_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        return payload
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Refresh token expirado.")
+    except PyJWTError:
+        raise HTTPException(status_code=401, detail="Refresh token inválido.")
+    if payload.get("typ") != REFRESH_TOKEN_TYPE or not payload.get("fam") or not payload.get("jti"):
+        raise HTTPException(status_code=401, detail="Refresh token inválido.")
+    return payload
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def decode_jwt_token(token: str):
+    key = _token_key(token)
+    payload = _verified_tokens.get(key)
+    if payload is not None:
+        return dict(payload)
+
+    try:
+        with stage("jwt.decode"):
+            payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expirado.")
     except PyJWTError:
         raise HTTPException(status_code=401, detail="Token inválido.")
+    if payload.get("typ") == REFRESH_TOKEN_TYPE:
+        # Un refresh token no sirve como token de acceso.
+        raise HTTPException(status_code=401, detail="Token inválido.")
 
-def validate(func):
-    @wraps(func)
-    async def wrapper(*args, **kwargs):
-        request: Request = kwargs.get("request")
-        if not request:
-            raise HTTPException(status_code=400, detail="Objeto request no encontrado.")
+    # La entrada nunca sobrevive al "exp" del token.
+    exp = payload.get("exp")
+    ttl = AUTH_CACHE_MAX_TTL if exp is None else min(AUTH_CACHE_MAX_TTL, exp - time.time())
+    if ttl > 0:
+        _verified_tokens.set(key, payload, ttl=ttl)
+    return dict(payload)
 
-        auth_header = request.headers.get("Authorization")
-        if not auth_header:
-            raise HTTPException(status_code=401, detail="Encabezado de autorización faltante.")
+def get_auth_cache_stats() -> dict:
+    return _verified_tokens.stats()
 
-        try:
-            scheme, token = auth_header.split()
-            if scheme.lower() != "bearer":
-                raise HTTPException(status_code=401, detail="Esquema de autenticación inválido.")
-            payload = decode_jwt_token(token)
+def _bearer_token(request: Request) -> str:
+    auth_header = request.headers.get("Authorization")
+    if not auth_header:
+        raise HTTPException(status_code=401, detail="Encabezado de autorización faltante.")
+    try:
+        scheme, token = auth_header.split()
+    except ValueError:
+        raise HTTPException(status_code=401, detail="Formato de token inválido.")
+    if scheme.lower() != "bearer":
+        raise HTTPException(status_code=401, detail="Esquema de autenticación inválido.")
+    return token
+
+def get_request_claims(request: Request, token: Optional[str] = None) -> dict:
+    # Los claims se decodifican una vez por petición y se reutilizan desde request.state.
+    claims = getattr(request.state, "user", None)
+    if claims is not None:
+        return claims
+    claims = decode_jwt_token(token if token is not None else _bearer_token(request))
+    request.state.user = claims
+    request.state.email = claims.get("email")
+    return claims
+
+def _request_from(kwargs: dict) -> Request:
+    request: Request = kwargs.get("request")
+    if not request:
+        raise HTTPException(status_code=400, detail="Objeto request no encontrado.")
+    return request
 
-            if not payload.get("active"):
-                raise HTTPException(status_code=403, detail="Usuario inactivo.")
+def validate(func):
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        payload = get_request_claims(_request_from(kwargs))
 
-            request.state.email = payload.get("email")
+        if not payload.get("active"):
+            raise HTTPException(status_code=403, detail="Usuario inactivo.")
 
-            return await func(*args, **kwargs)
-        except ValueError:
-            raise HTTPException(status_code=401, detail="Formato de token inválido.")
+        return await func(*args, **kwargs)
     return wrapper
 
 def validateadmin(func):
     @wraps(func)
     async def wrapper(*args, **kwargs):
-        request: Request = kwargs.get("request")
-        if not request:
-            raise HTTPException(status_code=400, detail="Objeto request no encontrado.")
-
-        auth_header = request.headers.get("Authorization")
-        if not auth_header:
-            raise HTTPException(status_code=401, detail="Encabezado de autorización faltante.")
-
-        try:
-            scheme, token = auth_header.split()
-            if scheme.lower() != "bearer":
-                raise HTTPException(status_code=401, detail="Esquema de autenticación inválido.")
-            payload = decode_jwt_token(token)
-
-            if not payload.get("active"):
-                raise HTTPException(status_code=403, detail="Usuario inactivo.")
+        payload = get_request_claims(_request_from(kwargs))
 
-            if not payload.get("admin"):
-                raise HTTPException(status_code=403, detail="Permisos de administrador requeridos.")
+        if not payload.get("active"):
+            raise HTTPException(status_code=403, detail="Usuario inactivo.")
 
-            request.state.email = payload.get("email")
+        if not payload.get("admin"):
+            raise HTTPException(status_code=403, detail="Permisos de administrador requeridos.")
 
-            return await func(*args, **kwargs)
-        except ValueError:
-            raise HTTPException(status_code=401, detail="Formato de token inválido.")
+        return await func(*args, **kwargs)
     return wrapper
\ No newline at end of file
@@ -0,0 +1,42 @@
+import json
+from typing import Any, Iterable, Sequence
+from fastapi.responses import Response
+
+from utils.metrics import stage
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value: Any):
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode("utf-8", errors="replace")
+    return str(value)
+
+
+def dumps_bytes(data: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data, default=_default)
+    return json.dumps(data, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def rows_to_json(columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> bytes:
+    with stage("json.serialize"):
+        return dumps_bytes([dict(zip(columns, row)) for row in rows])
+
+
+class RawJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, (bytes, bytearray)):
+            return bytes(content)
+        return dumps_bytes(content)
@@ -0,0 +1,117 @@
+import os
+import gc
+import math
+import logging
+import warnings
+
+from utils.logging_config import route_uvicorn_loggers
+
+logger = logging.getLogger(__name__)
+
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+# 0 = automático: WORKERS_PER_CORE por CPU disponible para el contenedor, con MAX_WORKERS como tope.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "0"))
+WORKERS_PER_CORE = float(os.getenv("WORKERS_PER_CORE", "1"))
+MAX_WORKERS = int(os.getenv("MAX_WORKERS", "0"))
+SERVER_PRELOAD = os.getenv("SERVER_PRELOAD", "true").lower() in ("1", "true", "yes")
+# Segundos que tiene un worker para terminar las peticiones en curso y cerrar BD/Redis tras SIGTERM.
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+# Parte del plazo reservada al cierre del lifespan una vez drenadas las peticiones.
+SHUTDOWN_MARGIN = int(os.getenv("SHUTDOWN_MARGIN", "5"))
+KEEPALIVE = int(os.getenv("SERVER_KEEPALIVE", "5"))
+# Proxies cuyo X-Forwarded-For se acepta (IPs o redes CIDR, separadas por comas). uvicorn recorre la
+# cabecera desde la derecha y toma como cliente la primera IP que no sea de estos proxies; con "*"
+# tomaría la de más a la izquierda, que la escribe el propio cliente. Por defecto, un proxy local.
+TRUSTED_PROXY_IPS = os.getenv("TRUSTED_PROXY_IPS", "127.0.0.1")
+
+try:
+    from uvicorn_worker import UvicornWorker
+except ImportError:
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            from uvicorn.workers import UvicornWorker
+    except ImportError:
+        UvicornWorker = None
+
+
+def _cgroup_cpu_limit():
+    # Cuota de CPU del contenedor (cgroup v2 y v1); os.cpu_count() devuelve los núcleos del host.
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as handle:
+            quota, period = handle.read().split()
+        if quota != "max":
+            return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as handle:
+            quota = int(handle.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as handle:
+            period = int(handle.read())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def available_cpus() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    limit = _cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, max(1, math.ceil(limit)))
+    return cpus
+
+
+def worker_count() -> int:
+    if WEB_CONCURRENCY > 0:
+        return WEB_CONCURRENCY
+    workers = max(1, math.ceil(available_cpus() * WORKERS_PER_CORE))
+    if MAX_WORKERS > 0:
+        workers = min(workers, MAX_WORKERS)
+    return workers
+
+
+def preload_shared_state() -> None:
+    # Corre en el proceso maestro con la app ya importada y antes del fork: lo que se cargue aquí
+    # se comparte entre workers por copy-on-write. Nada de conexiones, hilos ni event loops.
+    from controllers.catalogstats import preload_catalog_stats
+
+    try:
+        # El Admin SDK se inicializa de forma diferida en cada worker; importarlo aquí evita pagar
+        # su importación una vez por proceso.
+        import firebase_admin.auth  # noqa: F401
+    except ImportError:
+        pass
+    try:
+        preload_catalog_stats()
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudieron precargar las estadísticas del catálogo: {e}")
+
+    # Los objetos precargados pasan a la generación permanente: el GC de los workers no los recorre
+    # y no ensucia sus páginas de memoria compartidas.
+    gc.collect()
+    gc.freeze()
+
+
+if UvicornWorker is not None:
+
+    class ProductionWorker(UvicornWorker):
+        # uvloop y httptools cuando están instalados ("auto"); asyncio y h11 si no.
+        CONFIG_KWARGS = {
+            "loop": "auto",
+            "http": "auto",
+            "lifespan": "on",
+            "timeout_graceful_shutdown": max(1, GRACEFUL_TIMEOUT - SHUTDOWN_MARGIN),
+            # forwarded_allow_ips de gunicorn no admite redes CIDR: se pasa directamente a uvicorn.
+            "forwarded_allow_ips": TRUSTED_PROXY_IPS,
+        }
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            route_uvicorn_loggers()
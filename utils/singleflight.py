@@ -0,0 +1,26 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+_inflight: Dict[str, asyncio.Task] = {}
+
+
+def _forget(key: str, task: asyncio.Task) -> None:
+    if _inflight.get(key) is task:
+        del _inflight[key]
+    # Marca la excepción como recuperada aunque todos los solicitantes se hayan cancelado.
+    if not task.cancelled():
+        task.exception()
+
+
+async def single_flight(key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+    # La carga corre en su propia tarea: si el primer solicitante se cancela, los demás siguen esperándola.
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(func())
+        _inflight[key] = task
+        task.add_done_callback(lambda t: _forget(key, t))
+    return await asyncio.shield(task)
+
+
+def inflight_count() -> int:
+    return len(_inflight)
@@ -1,18 +1,17 @@
 import os
 import logging
-from dotenv import load_dotenv
-from azure.monitor.opentelemetry import configure_azure_monitor
-from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
 
 logger = logging.getLogger(__name__)
 
 def init_telemetry():
     try:
-        load_dotenv(override=True)
         connection_string = os.getenv("APPINSIGHTS_CONNECTION_STRING")
         if not connection_string:
             logger.warning("Connection string de Application Insights no encontrada en .env")
             return False
+        # El SDK de Azure Monitor tarda ~0.5 s en importarse: solo se carga si la telemetría está configurada.
+        from azure.monitor.opentelemetry import configure_azure_monitor
+
         service_name = os.getenv("DTEL_SERVICE_NAME", "Movies_API")
         configure_azure_monitor(
             connection_string=connection_string,
@@ -29,6 +28,8 @@ def init_telemetry():
 
 def instrument_fastapi_app(app):
     try:
+        from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+
         FastAPIInstrumentor.instrument_app(app)
         logger.info("FastAPI instrumentado para telemetría Azure")
     except Exception as e: